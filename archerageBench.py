@@ -0,0 +1,543 @@
+# python3
+# archerageBench.py
+
+"""Benchmarks for archerageStats.py, printing lines per second. Not needed to use archerageStats.py.
+Run from the command line: python archerageBench.py
+Stage timings are also written to a JSON file, see bench_stages(). python archerageBench.py --help for options.
+"""
+
+import argparse
+import copy
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import archerageStats
+
+
+IMPORT_TIME_BUDGET = 0.3 # seconds, for importing archerageStats and parsing a small combat.log in a new process
+
+
+# one line per event kind, as found in combat.log files. %s are replaced by player names
+SAMPLE_LINES = {"EN" : (
+    "[10/14/23 21:03:05] %s|r attacked %s|r using |cff25fcffFlamebolt|r and caused |cffff0000-1873|r damage.\n",
+    "[10/14/23 21:03:05] %s|r attacked %s|r and caused |cffff0000-412|r damage.\n",
+    "[10/14/23 21:03:05] %s|r attacked %s|r! Attack Blocked, resulting in |cffff0000-215|r damage.\n",
+    "[10/14/23 21:03:05] %s|r targeted %s|r using |cff25fcffMending|r to restore |cff00ff001520|r health.\n",
+    "[10/14/23 21:03:06] %s|r gained the buff: |cff25fcffQuickstep (Rank 5)|r.\n",
+    "[10/14/23 21:03:06] %s|r was struck by a |cff25fcffUnguarded|r debuff!\n",
+    "[10/14/23 21:03:06] %s|r's |cff25fcffQuickstep (Rank 5)|r buff ended.\n",
+    "[10/14/23 21:03:06] %s|r successfully cast |cff25fcffFlamebolt|r!\n",
+    "[10/14/23 21:03:07] %s|r is casting |cff25fcffFlamebolt|r.\n",
+    "[10/14/23 21:03:07] %s|r attacked %s|r! Attack Missed.\n",
+    "[10/14/23 21:03:07] %s|r attacked Kraken|r using |cff25fcffFlamebolt|r and caused |cffff0000-99|r damage.\n"),
+    "RU" : (
+    "[10/14/23 21:03:05] %s|r применяет умение «|cff25fcffОгненная стрела|r». %s|r получает урон, здоровье снижается на |cffff0000-1873|r ед.\n",
+    "[10/14/23 21:03:05] %s|r атакует. %s|r получает урон, здоровье снижается на |cffff0000-412|r ед.\n",
+    "[10/14/23 21:03:05] %s|r применяет умение «|cff25fcffИсцеление|r». %s|r восстанавливает |cff00ff001520|r ед. здоровья.\n",
+    "[10/14/23 21:03:06] %s|r: наложен усиливающий эффект «|cff25fcffПоходный марш V|r».\n",
+    "[10/14/23 21:03:06] %s|r: наложен ослабляющий эффект «|cff25fcffУязвимость|r».\n",
+    "[10/14/23 21:03:06] %s|r: эффект «|cff25fcffПоходный марш V|r» рассеялся.\n",
+    "[10/14/23 21:03:06] %s|r: применено умение «|cff25fcffОгненная стрела|r».\n",
+    "[10/14/23 21:03:07] %s|r применяет умение «|cff25fcffОгненная стрела|r».\n",
+    "[10/14/23 21:03:07] %s|r: Промах!\n",
+    "[10/14/23 21:03:07] %s|r применяет умение «|cff25fcffОгненная стрела|r». Кракен|r получает урон, здоровье снижается на |cffff0000-99|r ед.\n")}
+
+
+def build_sample_lines(lang, n_lines) -> "list[str]":
+    """Returns n_lines lines of the given language, cycling through SAMPLE_LINES with 40 player names."""
+    lines = []
+    samples = SAMPLE_LINES[lang]
+    for n in range(n_lines):
+        sample = samples[n % len(samples)]
+        names = ("Player%s" % (n % 40), "Player%s" % ((n * 7) % 40))
+        lines.append(sample % names[:sample.count("%s")])
+    return lines
+
+
+# combat.log lines of generate_combat_log(), by language and event kind. Fields: src, tgt (entity names), skill, song, value
+EVENT_TEMPLATES = {"EN" : {
+    "dmg" : ("{src}|r attacked {tgt}|r using |cff25fcff{skill}|r and caused |cffff0000-{value}|r damage.",),
+    "autoattack" : ("{src}|r attacked {tgt}|r and caused |cffff0000-{value}|r damage.",
+        "{src}|r attacked {tgt}|r! Attack Blocked, resulting in |cffff0000-{value}|r damage."),
+    "heal" : ("{src}|r targeted {tgt}|r using |cff25fcff{skill}|r to restore |cff00ff00{value}|r health.",),
+    "song_gained" : ("{tgt}|r gained the buff: |cff25fcff{song}|r.",),
+    "song_struck" : ("{tgt}|r was struck by a |cff25fcff{song}|r debuff!",),
+    "song_ended" : ("{tgt}|r's |cff25fcff{song}|r buff ended.",),
+    "skill_cast" : ("{src}|r successfully cast |cff25fcff{skill}|r!",),
+    "discard" : ("{src}|r is casting |cff25fcff{skill}|r.", "{src}|r attacked {tgt}|r! Attack Missed.",
+        "{src}|r attacked Kraken|r using |cff25fcff{skill}|r and caused |cffff0000-{value}|r damage.",
+        "{src}|r targeted {tgt}|r using |cff25fcff{skill}|r to restore |cff0000ff{value}|r mana.")},
+    "RU" : {
+    "dmg" : ("{src}|r применяет умение «|cff25fcff{skill}|r». {tgt}|r получает урон, здоровье снижается на |cffff0000-{value}|r ед.",),
+    "autoattack" : ("{src}|r атакует. {tgt}|r получает урон, здоровье снижается на |cffff0000-{value}|r ед.",),
+    "heal" : ("{src}|r применяет умение «|cff25fcff{skill}|r». {tgt}|r восстанавливает |cff00ff00{value}|r ед. здоровья.",),
+    "song_gained" : ("{tgt}|r: наложен усиливающий эффект «|cff25fcff{song}|r».",),
+    "song_struck" : ("{tgt}|r: наложен ослабляющий эффект «|cff25fcff{song}|r».",),
+    "song_ended" : ("{tgt}|r: эффект «|cff25fcff{song}|r» рассеялся.",),
+    "skill_cast" : ("{src}|r: применено умение «|cff25fcff{skill}|r».",),
+    "discard" : ("{src}|r применяет умение «|cff25fcff{skill}|r».", "{src}|r: Промах!",
+        "{src}|r применяет умение «|cff25fcff{skill}|r». Кракен|r получает урон, здоровье снижается на |cffff0000-{value}|r ед.")}}
+
+GENERATOR_NAMES = {"EN" : {"players" : "Player%s", "npcs" : ("Training Dummy", "Guard Captain"),
+    "skills" : ("Flamebolt", "Chain Lightning", "Triple Slash", "Mending", "Antithesis", "Healing Potion", "Phoenix Flame", "Absorb Damage"),
+    "buffs" : ("Bulwark Ballad (Rank 2)", "Bloody Chantey (Rank 2)", "Quickstep (Rank 5)", "Courageous Action"),
+    "debuffs" : ("Unguarded", "Lethargy (Bloody Chantey)", "Unpleasant Sensation (Quickstep)", "Stun")},
+    "RU" : {"players" : "Игрок%s", "npcs" : ("Учебный манекен", "Страж Ворот"),
+    "skills" : ("Огненная стрела", "Исцеление", "Удар", "Сансам"),
+    "buffs" : ("Гимн земли II", "Рапсодия битвы II", "Походный марш V", "Отвага"),
+    "debuffs" : ("Уязвимость", "Аура беспомощности", "Замедление", "Оглушение")}}
+
+DEFAULT_EVENT_MIX = {"dmg" : 30, "autoattack" : 10, "heal" : 15, "skill_cast" : 15, "discard" : 15, "song" : 15} # relative weights
+
+
+def generate_combat_log(f, lang="EN", players=40, duration=600, events_per_second=30, event_mix=None,
+    song_churn=0.5, lang_switches=0, seed=0, start_time=1697317200) -> int:
+    """Write a synthetic combat.log to the open text file f, returns the amount of lines written. Same arguments, same file.
+    players -- amount of player names, a few NPC names with spaces are added
+    duration -- seconds between the first and the last line, events_per_second lines are written per second on average
+    event_mix -- {"dmg", "autoattack", "heal", "skill_cast", "discard", "song" : relative weight}, default DEFAULT_EVENT_MIX
+    song_churn -- chance for a song event to end a song already up instead of applying one
+    lang_switches -- amount of times the language switches between EN and RU, evenly spread, starting with lang
+    start_time -- seconds since epoch of the first line, written as UTC so the file doesn't depend on the timezone
+    """
+    rnd = random.Random(seed)
+    event_mix = DEFAULT_EVENT_MIX if event_mix is None else event_mix
+    kinds = tuple(event_mix)
+    weights = tuple(event_mix[kind] for kind in kinds)
+    songs_up = {} # {(lang, entity) : [song, ...]}
+
+    f.write("Combat log started\n")
+    lines_written = 1
+    for second in range(duration):
+        current_lang = lang
+        if lang_switches > 0 and (second * (lang_switches + 1) // duration) % 2 == 1:
+            current_lang = "RU" if lang == "EN" else "EN"
+        names = GENERATOR_NAMES[current_lang]
+        timestamp = time.strftime("[%m/%d/%y %H:%M:%S] ", time.gmtime(start_time + second))
+
+        for n in range(rnd.randint(0, events_per_second * 2)):
+            kind = rnd.choices(kinds, weights)[0]
+            fields = {"src" : names["players"] % (rnd.randrange(players)), "tgt" : names["players"] % (rnd.randrange(players)),
+                "skill" : rnd.choice(names["skills"]), "value" : rnd.randint(1, 5000)}
+            if rnd.random() < 0.05:
+                fields["tgt"] = rnd.choice(names["npcs"])
+
+            if kind == "song":
+                entity_songs = songs_up.setdefault((current_lang, fields["tgt"]), [])
+                if len(entity_songs) > 0 and rnd.random() < song_churn:
+                    kind = "song_ended"
+                    fields["song"] = entity_songs.pop(rnd.randrange(len(entity_songs)))
+                else:
+                    kind = rnd.choice(("song_gained", "song_struck"))
+                    fields["song"] = rnd.choice(names["buffs"] if kind == "song_gained" else names["debuffs"])
+                    entity_songs.append(fields["song"])
+
+            f.write(timestamp + rnd.choice(EVENT_TEMPLATES[current_lang][kind]).format(**fields) + "\n")
+            lines_written += 1
+
+    return lines_written
+
+
+def time_stage(function, repeat) -> float:
+    """Returns the best time in seconds of repeat calls to function."""
+    best = float("inf")
+    for n in range(repeat):
+        perf_counter_start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - perf_counter_start)
+    return best
+
+
+def capture_events(log_builder) -> dict:
+    """Replace the add_*_event() aggregators of a LogBuilder object by lists, so parsing only collects their event tuples.
+    Returns {aggregator name : list of event tuples}.
+    """
+    captured = {}
+    for name in ("add_dmg_event", "add_heal_event", "add_buff_debuff_event", "add_skill_cast_event"):
+        captured[name] = []
+        setattr(log_builder, name, captured[name].append)
+    return captured
+
+
+def bench_stages(sizes=(50000, 200000, 800000), repeat=3, output="bench_results.json", seed=0) -> dict:
+    """Time each stage of archerageStats on generated EN and RU combat.logs of about sizes lines, then on a log switching languages.
+    Stages: reading the file, line classification, regex extraction alone (of lines already classified, items: lines extracted),
+    parsing (classification and regex extraction), each add_*_event() aggregator,
+    build(), main_log_builder() and every chart function. Prints the results and writes them to output as JSON.
+    """
+    results = {"python" : sys.version, "platform" : platform.platform(), "seed" : seed, "repeat" : repeat, "stages" : []}
+
+    def record(lang, lines, stage, seconds, items=None):
+        items = lines if items is None else items
+        result = {"lang" : lang, "lines" : lines, "stage" : stage, "seconds" : seconds, "items" : items,
+            "items_per_sec" : items / seconds if seconds > 0 else None}
+        results["stages"].append(result)
+        print("%s | %8s lines | %-34s %9.4f s | %10.0f items/sec" % (lang, lines, stage, seconds, result["items_per_sec"] or 0))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cwd = os.getcwd()
+        os.chdir(temp_dir) # chart functions save to the CWD
+        try:
+            for size in sizes:
+                for lang, lang_switches in (("EN", 0), ("RU", 0), ("EN", 5)):
+                    combat_log = os.path.join(temp_dir, "combat.log")
+                    with open(combat_log, 'w', encoding='utf-8') as f:
+                        n_lines = generate_combat_log(f, lang=lang, duration=max(size // 30, 1), lang_switches=lang_switches, seed=seed)
+                    if lang_switches > 0:
+                        lang = "EN/RU"
+                        record(lang, n_lines, "main_log_builder", time_stage(lambda: archerageStats.main_log_builder(combat_log, use_cache=False), repeat))
+                        continue
+
+                    def read_lines():
+                        with open(combat_log, 'r', encoding='utf-8') as f:
+                            return f.readlines()
+                    record(lang, n_lines, "read", time_stage(read_lines, repeat))
+                    lines = read_lines()
+
+                    lang_current = archerageStats.Locale()
+                    lang_current.use(lang)
+                    classify = lang_current.line_classifier.classify
+                    record(lang, n_lines, "classify", time_stage(lambda: [classify(line) for line in lines], repeat))
+
+                    event_regexes = lang_current.event_regexes
+                    classified = [(line, event_regexes[kind]) for line, kind in zip(lines, map(classify, lines)) if kind in event_regexes]
+                    record(lang, n_lines, "extract", time_stage(lambda: [event_regex.search(line).group(*group_numbers)
+                        for line, (event_regex, group_numbers) in classified], repeat), items=len(classified))
+
+                    def parse():
+                        log_builder = archerageStats.LogBuilder(lang=lang)
+                        captured = capture_events(log_builder)
+                        log_builder.feed_lines(lines)
+                        return captured
+                    record(lang, n_lines, "parse (classify + extract)", time_stage(parse, repeat))
+                    captured = parse()
+
+                    for name, events in captured.items():
+                        def aggregate():
+                            log_builder = archerageStats.LogBuilder(lang=lang)
+                            log_builder.last_timestamp = lines[-1][1:18]
+                            aggregator = getattr(log_builder, name)
+                            for event in events:
+                                aggregator(event)
+                        record(lang, n_lines, name, time_stage(aggregate, repeat), items=len(events))
+
+                    log_builder = archerageStats.LogBuilder()
+                    log_builder.feed_lines(lines)
+                    record(lang, n_lines, "build", time_stage(log_builder.build, repeat))
+                    record(lang, n_lines, "main_log_builder", time_stage(lambda: archerageStats.main_log_builder(combat_log, use_cache=False), repeat))
+
+                    log_stats = log_builder.build()
+                    charts = {"horizontal_bar_plot" : lambda: archerageStats.horizontal_bar_plot(
+                            archerageStats.build_simple_dict(log_stats.dmg_log), filename='Outgoing Damage.png'),
+                        "stacked_horizontal_bar_plot" : lambda: archerageStats.stacked_horizontal_bar_plot(
+                            archerageStats.build_simple_dict(log_stats.received_dmg_log), archerageStats.build_simple_dict(log_stats.self_heal_log)),
+                        "complex_song_plot (buffs)" : lambda: archerageStats.complex_song_plot(
+                            copy.deepcopy(log_stats.tracked_songs_total_buffs), True, filename='Song Buffs.png'),
+                        "complex_song_plot (debuffs)" : lambda: archerageStats.complex_song_plot(
+                            copy.deepcopy(log_stats.tracked_songs_total_debuffs), False, filename='Song Charms.png')}
+                    for name, chart in charts.items():
+                        record(lang, n_lines, name, time_stage(chart, repeat), items=1)
+        finally:
+            os.chdir(cwd)
+
+    if output is not None:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+        print('Results written to "%s"' % (output))
+    return results
+
+
+def bench_import_time(repeat=5, budget=IMPORT_TIME_BUDGET) -> bool:
+    """Check that a parse only use of archerageStats starts fast: in new processes, time importing main_log_builder and LogStats
+    and parsing a small generated combat.log. Prints the best time, fails if above budget seconds or if matplotlib or tkinter got imported.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        combat_log = os.path.join(temp_dir, "combat.log")
+        with open(combat_log, 'w', encoding='utf-8') as f:
+            generate_combat_log(f, duration=10)
+
+        code = """import sys, time, json
+perf_counter_start = time.perf_counter()
+from archerageStats import main_log_builder, LogStats
+import_seconds = time.perf_counter() - perf_counter_start
+log_stats = main_log_builder(sys.argv[1], use_cache=False)
+print(json.dumps({"import" : import_seconds, "total" : time.perf_counter() - perf_counter_start,
+    "heavy_modules" : sorted(m for m in ("matplotlib", "tkinter") if m in sys.modules)}))"""
+        runs = []
+        for n in range(repeat):
+            output = subprocess.run([sys.executable, "-c", code, combat_log], capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(archerageStats.__file__))).stdout
+            runs.append(json.loads(output))
+
+    best = min(runs, key=lambda run: run["total"])
+    heavy_modules = sorted(set(m for run in runs for m in run["heavy_modules"]))
+    passed = best["total"] <= budget and len(heavy_modules) == 0
+    print("import time | import: %.3f s | import + parse: %.3f s | budget: %.3f s | heavy modules imported: %s | %s" %
+        (best["import"], best["total"], budget, heavy_modules or "none", "OK" if passed else "FAILED"))
+    return passed
+
+
+def legacy_classify_EN(lang_current, line_EN) -> "str | None":
+    """sort_log_events_EN()'s chain of substring checks before LineClassifier and the locale grammars, kept for comparison."""
+    if any(a in line_EN for a in lang_current.unwanted_events)\
+    or any(a in line_EN for a in lang_current.pve_bosses):
+        return "discard"
+
+    if "|r's" in line_EN or "was struck by a" in line_EN or "gained the buff:" in line_EN:
+        return "buff_debuff"
+    elif "|r successfully cast |" in line_EN:
+        return "skill_cast"
+    elif "|r attacked " in line_EN and "|r using |" in line_EN:
+        return "dmg"
+    elif "|r targeted " in line_EN:
+        return "heal"
+    elif "|r attacked " in line_EN:
+        return "autoattack"
+    return None
+
+
+def legacy_classify_RU(lang_current, line_RU) -> "str | None":
+    """sort_log_events_RU()'s chain of substring checks before LineClassifier and the locale grammars, kept for comparison.
+    Its is casting regex is now the pattern of the RU grammar's discard rule.
+    """
+    if any(a in line_RU for a in lang_current.unwanted_events)\
+    or any(a in line_RU for a in lang_current.pve_bosses)\
+    or lang_current.line_classifier.rules[1]["pattern"].search(line_RU) is not None:
+        return "discard"
+
+    elif ": наложен" in line_RU or "эффект " in line_RU:
+        return "buff_debuff"
+    elif ": применено умение" in line_RU:
+        return "skill_cast"
+    elif "снижается на" in line_RU and " атакует" not in line_RU\
+    or "блокирует " in line_RU and " атакует" not in line_RU\
+    or "парирует " in line_RU and " атакует" not in line_RU:
+        return "dmg"
+    elif "восстанавливает " in line_RU:
+        return "heal"
+    elif " атакует" in line_RU:
+        return "autoattack"
+    return None
+
+
+def bench_classify(n_lines=200000, repeat=3):
+    """Compare lines/sec of Locale's LineClassifier against the legacy chain of substring checks, per language.
+    Both must give the same kind for every line. The discard rule (unwanted events and pve bosses) is also timed alone,
+    against the legacy chain's any() checks.
+    """
+    legacy_classifiers = {"EN" : legacy_classify_EN, "RU" : legacy_classify_RU}
+
+    def compare(lang, name, legacy_classify, classify, lines):
+        if [legacy_classify(line) for line in lines] != [classify(line) for line in lines]:
+            raise ValueError("LineClassifier and the legacy chain disagree on %s lines (%s)" % (lang, name))
+
+        best_legacy = best_classifier = float("inf")
+        for n in range(repeat):
+            perf_counter_start = time.perf_counter()
+            for line in lines:
+                legacy_classify(line)
+            best_legacy = min(best_legacy, time.perf_counter() - perf_counter_start)
+
+            perf_counter_start = time.perf_counter()
+            for line in lines:
+                classify(line)
+            best_classifier = min(best_classifier, time.perf_counter() - perf_counter_start)
+
+        print("%s %s | legacy chain: %.0f lines/sec | LineClassifier: %.0f lines/sec | x%.2f" %
+            (lang, name, len(lines) / best_legacy, len(lines) / best_classifier, best_legacy / best_classifier))
+
+    for lang in ("EN", "RU"):
+        lang_current = archerageStats.Locale()
+        lang_current.use(lang)
+        lines = build_sample_lines(lang, n_lines)
+        legacy_classify = legacy_classifiers[lang]
+        compare(lang, "classify", lambda line: legacy_classify(lang_current, line), lang_current.line_classifier.classify, lines)
+
+        discard_classifier = archerageStats.LineClassifier(lang_current.line_classifier.rules[:1])
+        compare(lang, "discard (unwanted events, pve bosses)",
+            lambda line: any(a in line for a in lang_current.unwanted_events) or any(a in line for a in lang_current.pve_bosses),
+            lambda line: discard_classifier.classify(line) is not None, lines)
+
+
+def legacy_track_songs(events) -> "tuple[dict, dict, int]":
+    """sort_buff_debuff_event()'s song tracker before LogBuilder's expiry queue, kept for comparison: at every event, every song
+    still up on every entity is aged and checked. events are add_buff_debuff_event() tuples, see capture_events().
+    Returns the sorted tracked_songs_total_buffs, tracked_songs_total_debuffs and log_elapsed_time, as in LogStats.
+    """
+    entities = archerageStats.EntityRegistry()
+    BUFFS, DEBUFFS = archerageStats.LogBuilder.BUFFS, archerageStats.LogBuilder.DEBUFFS
+    timer = archerageStats.log_timestamp_to_epoch(events[0][0])
+    log_elapsed_time = 0
+    tracking_temporary = {} # {str Entity : {str Song: int Seconds, str Song: int Seconds, ...}}
+    tracked_songs_total_buffs = {} # ditto
+    tracked_songs_total_debuffs = {} # ditto
+
+    def tracked_songs_total_addition(entity, song, seconds):
+        dictionary_reference = tracked_songs_total_buffs if song in BUFFS else tracked_songs_total_debuffs
+        dictionary_reference.setdefault(entity, {})
+        dictionary_reference[entity][song] = dictionary_reference[entity].get(song, 0) + seconds
+
+    for timestamp, entity, identifier, song, lang in events:
+        song = song.lower()
+        if not entities.is_player(entity) or song not in (BUFFS + DEBUFFS):
+            continue
+
+        event_time = archerageStats.log_timestamp_to_epoch(timestamp)
+        time_difference = event_time - timer
+        log_elapsed_time += time_difference
+
+        delete_queue = []
+        for k in tracking_temporary:
+            for s in tracking_temporary[k]:
+                tracking_temporary[k][s] += time_difference
+                if tracking_temporary[k][s] > 4: # songs cannot be over 5 seconds in length + handles mismatch
+                    tracked_songs_total_addition(k, s, 5)
+                    delete_queue.append((k, s))
+        for k, s in delete_queue:
+            del tracking_temporary[k][s]
+
+        timer = event_time
+        tracking_temporary.setdefault(entity, {})
+        if identifier == 'gained' or identifier == 'struck':
+            tracking_temporary[entity][song] = 0
+        elif identifier == 's' and song in tracking_temporary[entity]:
+            tracked_songs_total_addition(entity, song, tracking_temporary[entity].pop(song))
+
+    def sort_by_time_total(dictionary):
+        return dict(sorted(dictionary.items(), key=lambda x: sum(x[1].values()), reverse=True))
+    return sort_by_time_total(tracked_songs_total_buffs), sort_by_time_total(tracked_songs_total_debuffs), log_elapsed_time
+
+
+def bench_parallel(sizes=(50000, 200000, 800000), repeat=3, workers=None, chunk_size=256 * 1024, seed=0):
+    """Compare lines/sec of parallel_log_builder() against a serial main_log_builder(), without the event cache, on generated
+    combat.logs of about sizes lines switching between EN and RU, with songs often ended and refreshed. Chunks are small by
+    default, so that chunks start in either language and songs span chunks. Both must give the same LogStats, ties in the same order,
+    and the serial song totals must equal legacy_track_songs()' on the same events.
+    """
+    event_mix = dict(DEFAULT_EVENT_MIX, song=45)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in sizes:
+            combat_log = os.path.join(temp_dir, "combat.log")
+            with open(combat_log, 'w', encoding='utf-8') as f:
+                n_lines = generate_combat_log(f, lang="EN", duration=max(size // 30, 1), event_mix=event_mix, song_churn=0.7,
+                    lang_switches=7, seed=seed)
+
+            serial = lambda: archerageStats.main_log_builder(combat_log, use_cache=False)
+            parallel = lambda: archerageStats.parallel_log_builder(combat_log, workers=workers, chunk_size=chunk_size)
+            serial_log_stats = serial()
+            if json.dumps(vars(serial_log_stats), default=sorted) != json.dumps(vars(parallel()), default=sorted): # dicts keep their order
+                raise ValueError("parallel_log_builder() and main_log_builder() disagree on %s lines" % (n_lines))
+
+            log_builder = archerageStats.LogBuilder()
+            captured = capture_events(log_builder)
+            with open(combat_log, 'r', encoding='utf-8') as f:
+                log_builder.feed_lines(f)
+            if json.dumps(legacy_track_songs(captured["add_buff_debuff_event"])) != json.dumps((serial_log_stats.tracked_songs_total_buffs,
+                serial_log_stats.tracked_songs_total_debuffs, serial_log_stats.log_elapsed_time)):
+                raise ValueError("The song tracker and the legacy one disagree on %s lines" % (n_lines))
+
+            best_serial = time_stage(serial, repeat)
+            best_parallel = time_stage(parallel, repeat)
+            print("EN/RU %8s lines | chunks of %s KiB | serial: %.0f lines/sec | parallel: %.0f lines/sec | x%.2f" %
+                (n_lines, chunk_size // 1024, n_lines / best_serial, n_lines / best_parallel, best_serial / best_parallel))
+
+
+def bench_group_by(sizes=(50000, 200000, 800000), repeat=3, seed=0):
+    """Compare events/sec of LogBuilder.feed_event_columns()'s dict path against its numpy group-by, on the recorded events
+    of generated EN combat.logs of about sizes lines. Both must give the same LogStats, ties in the same order.
+    """
+    for size in sizes:
+        f = io.StringIO()
+        n_lines = generate_combat_log(f, lang="EN", duration=max(size // 30, 1), seed=seed)
+        recorder = archerageStats.LogBuilder(record_events=True)
+        recorder.feed_lines(f.getvalue().splitlines(keepends=True))
+        event_columns = recorder.event_columns
+
+        def feed(group_by):
+            log_builder = archerageStats.LogBuilder()
+            log_builder.feed_event_columns(event_columns, group_by=group_by)
+            log_builder.first_timestamp, log_builder.last_timestamp = recorder.first_timestamp, recorder.last_timestamp
+            return log_builder.build()
+
+        dict_log_stats, numpy_log_stats = feed("dict"), feed("numpy")
+        if json.dumps(vars(dict_log_stats), default=sorted) != json.dumps(vars(numpy_log_stats), default=sorted): # dicts keep their order
+            raise ValueError("The dict and numpy group-by disagree on %s lines" % (n_lines))
+
+        best_dict = time_stage(lambda: feed("dict"), repeat)
+        best_numpy = time_stage(lambda: feed("numpy"), repeat)
+        print("EN %8s lines | %8s events | group-by dict: %.0f events/sec | numpy: %.0f events/sec | x%.2f" %
+            (n_lines, len(event_columns), len(event_columns) / best_dict, len(event_columns) / best_numpy, best_dict / best_numpy))
+
+
+def bench_render_charts(size=50000, repeat=3, workers=None, seed=0):
+    """Compare the wall time of render_charts() rendering its charts one after another and in its pool of processes,
+    on a generated EN combat.log of about size lines. workers overrides CHART_WORKERS (default: up to 5, one per CPU).
+    The pool is started before timing, as render_charts() keeps it between calls.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        f = io.StringIO()
+        n_lines = generate_combat_log(f, lang="EN", duration=max(size // 30, 1), seed=seed)
+        log_builder = archerageStats.LogBuilder()
+        log_builder.feed_lines(f.getvalue().splitlines(keepends=True))
+        log_stats = log_builder.build()
+
+        cwd = os.getcwd()
+        os.chdir(temp_dir) # charts are saved to the CWD
+        chart_workers = archerageStats.CHART_WORKERS
+        if workers is not None:
+            archerageStats.CHART_WORKERS = workers
+        try:
+            serial = time_stage(lambda: archerageStats.render_charts(copy.deepcopy(log_stats), parallel=False), repeat)
+            if archerageStats.CHART_WORKERS > 1:
+                archerageStats.render_charts(copy.deepcopy(log_stats)) # starts the pool
+                parallel = time_stage(lambda: archerageStats.render_charts(copy.deepcopy(log_stats)), repeat)
+            else:
+                parallel = serial
+        finally:
+            archerageStats.shutdown_chart_executor()
+            archerageStats.CHART_WORKERS = chart_workers
+            os.chdir(cwd)
+
+    print("EN %8s lines | %s CPUs | render_charts serial: %.3f s | %s processes: %.3f s | x%.2f" %
+        (n_lines, os.cpu_count(), serial, workers or archerageStats.CHART_WORKERS, parallel, serial / parallel))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for archerageStats.py")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50000, 200000, 800000], help="approximate lines of the generated combat.logs")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage, the best is kept")
+    parser.add_argument('--output', default="bench_results.json", help="JSON file for the stage results")
+    parser.add_argument('--generate', metavar='FILE', help="only write a generated combat.log (--sizes' first size, --lang) to FILE")
+    parser.add_argument('--lang', default="EN", choices=("EN", "RU"))
+    parser.add_argument('--lang-switches', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--import-time', action='store_true', help="only run the import time budget check, exit status 1 if it fails")
+    parser.add_argument('--group-by', action='store_true', help="only compare the dict and numpy group-by of recorded events (needs numpy)")
+    parser.add_argument('--charts', action='store_true', help="only compare render_charts() serial and in its pool of processes (--sizes' first size)")
+    parser.add_argument('--parallel', action='store_true', help="only compare parallel_log_builder() and a serial parse, checking they agree")
+    parser.add_argument('--workers', type=int, default=None, help="processes of parallel_log_builder() for --parallel (default: CPU count)")
+    parser.add_argument('--chart-workers', type=int, default=None, help="processes of render_charts()'s pool for --charts (default: CHART_WORKERS)")
+    args = parser.parse_args()
+
+    if args.import_time:
+        sys.exit(0 if bench_import_time() else 1)
+    elif args.group_by:
+        bench_group_by(sizes=args.sizes, repeat=args.repeat, seed=args.seed)
+    elif args.parallel:
+        bench_parallel(sizes=args.sizes, repeat=args.repeat, workers=args.workers, seed=args.seed)
+    elif args.charts:
+        bench_render_charts(size=args.sizes[0], repeat=args.repeat, workers=args.chart_workers, seed=args.seed)
+    elif args.generate is not None:
+        with open(args.generate, 'w', encoding='utf-8') as f:
+            print('%s lines written' % (generate_combat_log(f, lang=args.lang, duration=max(args.sizes[0] // 30, 1),
+                lang_switches=args.lang_switches, seed=args.seed)))
+    else:
+        bench_classify()
+        bench_stages(sizes=args.sizes, repeat=args.repeat, output=args.output, seed=args.seed)
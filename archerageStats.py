@@ -7,27 +7,39 @@ will be located in the current working directory (CWD). If the module is run at
 You will be prompted to choose a file with correct combat.log formatting, or an output.txt created from one.
 Output files will momentarily reside in the CWD, where it will overwrite any files with the same name without asking.
 They will be moved to a combatLog folder in the CWD where it will create a numbered folder inside the datefolder if there are conflicting files.
+
+Can also be imported, e.g. main_log_builder() to obtain a LogStats object. Importing has no side effects, and matplotlib and tkinter
+are only imported once a chart is drawn or a file prompted for. main() is the program's entry point.
 """
 
-import copy
+import argparse
+import array
+import atexit
+import bisect
+import contextlib
+import functools
+import glob
+import hashlib
+import heapq
+import io
+import itertools
+import multiprocessing
 import os
 import shutil
+import sqlite3
 import sys
 import time
+import tracemalloc
 import json
+import mmap
 import traceback
-from tkinter import filedialog
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import matplotlib.pyplot as plt # https://pypi.org/project/matplotlib/
 import regex as re # https://pypi.org/project/regex/
 re.DEFAULT_VERSION = re.VERSION1
 
-# uncomment if using as a python file
-if __name__ == '__main__':
-    os.chdir(sys.path[0])
-# or
-# uncomment if using as an .exe file through pyinstaller
-#app_path = os.path.dirname(sys.executable)
+plt = None # matplotlib.pyplot (https://pypi.org/project/matplotlib/), imported by load_pyplot() when first needed
+np = None # numpy (https://pypi.org/project/numpy/), optional, imported by load_numpy() for the numpy group-by
 
 
 class LogStats():
@@ -46,6 +58,7 @@ class LogStats():
         log_start_time = int (unix epoch)
         log_end_time = int (unix epoch)
         log_elapsed_time = int
+        log_line_count = int, lines read from the combat.log(s), 0 if regenerated from an output
         """
         self.dmg_log = {}
         self.received_dmg_log = {}
@@ -58,135 +71,1012 @@ class LogStats():
         self.log_start_time = -1
         self.log_end_time = -1
         self.log_elapsed_time = -1
+        self.log_line_count = 0
         self.langs_contained = set()
 
+    DICT_NAMES = ("dmg_log", "received_dmg_log", "heal_log", "self_heal_log", "tracked_songs_total_buffs",
+        "tracked_songs_total_debuffs", "tracked_player_skills", "tracked_skill_players")
+
+    def merge(self, other) -> "LogStats":
+        """Adds another LogStats object (another session, e.g. from load_snapshot()) to this one and returns this one.
+        Values are summed, times span both and elapsed times add up. other is left as it is, nothing of it is shared.
+        Nothing is sorted: new keys go after the keys already there, call sort() once done merging.
+        Merging is associative, (a.merge(b)).merge(c) and a.merge(b.merge(c)) give the same totals in the same key order,
+        so sessions can be reduced in any grouping, see merge_log_stats(). An empty LogStats() merges as nothing,
+        and so do the "NO DATA" placeholders write_to_txt() adds to empty dicts.
+        """
+        for name in self.DICT_NAMES:
+            dictionary = getattr(self, name)
+            for k, other_nested in getattr(other, name).items():
+                if not isinstance(other_nested, dict): # "NO DATA" : "IN DICT", added to an empty dict by write_to_txt()
+                    continue
+                nested = dictionary.setdefault(k, {})
+                for m, value in other_nested.items():
+                    nested[m] = nested.get(m, 0) + value
+
+        if other.log_start_time != -1:
+            self.log_start_time = other.log_start_time if self.log_start_time == -1 else min(self.log_start_time, other.log_start_time)
+            self.log_end_time = max(self.log_end_time, other.log_end_time)
+        if other.log_elapsed_time != -1: # a str when regenerated from an output.txt
+            self.log_elapsed_time = int(other.log_elapsed_time) + (0 if self.log_elapsed_time == -1 else int(self.log_elapsed_time))
+        self.log_line_count += other.log_line_count
+        self.langs_contained.update(other.langs_contained)
+        return self
+
+    def sort(self):
+        """Replaces every dict by a sorted copy, in the order LogBuilder.build() gives: players and skills by total,
+        songs by total time, skills used by name. Sorts are stable, ties keep their current order.
+        """
+        def sort_by_total(dictionary, total_key="total"):
+            """Sort by nested dict's total_key, then sort each nested dict by value"""
+            dictionary = dict(sorted(dictionary.items(), key=lambda x: x[1][total_key], reverse=True))
+            for k in dictionary:
+                dictionary[k] = dict(sorted(dictionary[k].items(), key=lambda x: x[1], reverse=True))
+            return dictionary
+
+        def sort_by_time_total(dictionary):
+            """Sort by the sum of the nested dict's values, keeping nested dicts' order"""
+            dictionary = dict(sorted(dictionary.items(), key=lambda x: sum(x[1].values()), reverse=True))
+            for k in dictionary:
+                dictionary[k] = dict(dictionary[k])
+            return dictionary
+
+        def sort_by_name(dictionary):
+            """Sort by key, then sort each nested dict by value"""
+            dictionary = dict(sorted(dictionary.items(), key=lambda x: x[0]))
+            for k in dictionary:
+                dictionary[k] = dict(sorted(dictionary[k].items(), key=lambda x: x[1], reverse=True))
+            return dictionary
+
+        self.dmg_log = sort_by_total(self.dmg_log)
+        self.received_dmg_log = sort_by_total(self.received_dmg_log)
+        self.heal_log = sort_by_total(self.heal_log)
+        self.self_heal_log = sort_by_total(self.self_heal_log)
+        self.tracked_songs_total_buffs = sort_by_time_total(self.tracked_songs_total_buffs)
+        self.tracked_songs_total_debuffs = sort_by_time_total(self.tracked_songs_total_debuffs)
+        self.tracked_player_skills = sort_by_name(self.tracked_player_skills)
+        self.tracked_skill_players = sort_by_name(self.tracked_skill_players)
+
 
 class Locale():
     """Contain info relevant to main_log_builder()'s language checks.
-    combat.log formatting is often different depending on language,
-    so simply changing this object may not be enough.
-    Available languages: ("EN", "RU"). When adding a language,
-    a new definition for it must be added in this class & edit main_log_builder()
+    combat.log formatting is often different depending on language. Each language is declared as data,
+    its grammar, with register_locale() and compiled on first use by use(). Available languages: LOCALE_GRAMMARS' keys.
     """
     def __init__(self):
-        """Use a locale method after calling the object to initialize it.
-        Available languages: ("EN", "RU")
+        """Use use(lang) after calling the object to initialize it. Lookup tables of every language are set here:
+        all_heal_potions, all_heal_pets = {lang : frozenset, ...}, all_songs = {lang : tuple, ...}
         """
-        self.all_lang_available = ("EN", "RU")
-        self.all_heal_potions = {"EN" : ('healing potion', 'minor healing potion', 'found wild ginseng!', 'healing grimoire',
-            'phoenix tears tincture', 'enhanced judge\'s longing', 'orange goblet of honor', 'sand soulshard',
-            'absorb damage', 'earth lunafrost', 'blessed rune: zena basta 6', 'revitalizing cheer', 'health regen food',
-            "judge's longing", 'absorb lifeforce', 'flame conversion shield (rank 5)', "wind soulshard",
-            "conversion shield (rank 5)", "for the battle"),
-            "RU" : ("исцеление", 'благосклонность акритеса ii', "благосклонность акритеса i", "письмена войны",
-            "надежда луны", "непреодолимое сопротивление", "кража жизни", "целебные эликсиры", "сансам",
-            "энергетический щит v", "гримуар тайного знания", """слова силы: а'ше"н'валь vi""",
-            "энергия забытого сада", "восстанавливающая здоровье еда")} # RU has unverified (by me) translations
-        self.all_heal_pets = {"EN" : ('phoenix flame',),
-            "RU" : ("",)} # pets that provide self-healing to the owner (target is owner, source is pet)
-        self.all_songs = {"EN" : ('bulwark ballad (rank 2)', 'bloody chantey (rank 2)', 'quickstep (rank 5)',
-            'unguarded', 'lethargy (bloody chantey)', 'unpleasant sensation (quickstep)'),
-            "RU" : ("Гимн земли II","Рапсодия битвы II","Походный марш V",
-            "Уязвимость","Аура беспомощности","Замедление")} # maintain order here
-
-    def EN(self):
-        """EN locale"""
-        
-        self.current_lang = "EN"
-
-        self.pve_bosses = ('Kraken', 'Meina', 'Glenn', 'Anthalon', 'Charybdis') # only need provide bosses without a space in the name
-        self.unwanted_events = ("|r is casting |", "|r mana.", "|r! Attack Missed.", "|r! Attack Immune!",
-            "|r! Attack Evaded," , "|cffff00000|r", "|r took", "attacked |r") # "|cffff00000|r": 0 dmg event (5 zeroes instead of 4)
-            # "attacked |r" somehow, you can have a target of a dmg event that is 0-length.
-        # self.no_spaces_in_names_regex = re.compile(r"(?:\[.+\] \S+\|r)(?: attacked \S+\|r| targeted \S+\|r| successfully| is casting| gained| was|\'s)")
-        self.damage_regex = re.compile(r'\] (.+)\|r attacked (.+)\|r using \|cff25fcff(.*)\|r.+\|cffff0000-(\d+)\|r')
-        self.auto_attack_regex = re.compile(r"\] (.+)\|r attacked (.+)\|r(?|! Attack (?:Blocked|Parried), resulting in \|cffff(0000)-(\d+)\|r| and caused \|cffff(0000)-(\d+)\|r)")
-        self.heal_regex = re.compile(r'\] (.+)\|r targeted (.+)\|r using \|cff25fcff(.*)\|r to restore \|cff00ff00(\d+)\|r health')
-        self.buff_debuff_regex = re.compile(r"\[(.+)\] (?|(?|(.+)\|r (gained) the buff: \|cff25fcff(.+)\|r|(.+)\|r was (struck) by a \|cff25fcff(.+)\|r debuff!)|(.+)\|r\'(s) \|cff25fcff(.+)\|r)")
-        self.skill_cast_regex = re.compile(r"\] (.+)\|r successfully cast \|cff25fcff(.+)\|r!")
-    
-    def RU(self):
-        """RU locale"""
-        
-        self.current_lang = "RU"
+        self.all_lang_available = tuple(LOCALE_GRAMMARS)
+        self.all_heal_potions = {lang : frozenset(grammar["heal_potions"]) for lang, grammar in LOCALE_GRAMMARS.items()}
+        self.all_heal_pets = {lang : frozenset(grammar["heal_pets"]) for lang, grammar in LOCALE_GRAMMARS.items()}
+        self.all_songs = {lang : grammar["songs"] for lang, grammar in LOCALE_GRAMMARS.items()}
+
+    compiled = {} # {lang : attributes set by compile()}, shared by every Locale object
+
+    def use(self, lang):
+        """Set the attributes of the lang locale. They are compiled by compile() once per process, then shared."""
+        if lang not in Locale.compiled:
+            locale = Locale()
+            locale.compile(lang)
+            Locale.compiled[lang] = vars(locale)
+        self.__dict__.update(Locale.compiled[lang])
+
+    def compile(self, lang):
+        """Compile the grammar of a language (see register_locale()), use use(lang) instead. Sets:
+        event_regexes = {kind : (compiled regex, group numbers)}, line_classifier (a LineClassifier),
+        identifiers = {captured identifier : "gained", "struck" or "s"}, song_names = {song : song as named in all_songs["EN"]},
+        heal_aliases = {substring : heal skill name}
+        """
+        grammar = LOCALE_GRAMMARS[lang]
+        self.current_lang = lang
+
+        self.pve_bosses = grammar["pve_bosses"]
+        self.unwanted_events = grammar["unwanted_events"]
+        self.event_regexes = {} # {kind : (compiled regex, numbers of its EVENT_GROUPS[kind] groups)}, numbers are faster than names
+        for kind, pattern in grammar["events"].items():
+            event_regex = re.compile(pattern)
+            self.event_regexes[kind] = (event_regex, tuple(event_regex.groupindex[name] for name in EVENT_GROUPS[kind]))
+
+        rules = [{"kind" : "discard", "any_of" : self.unwanted_events + self.pve_bosses}]
+        for rule in grammar["rules"]:
+            rule = dict(rule)
+            if "pattern" in rule:
+                rule["pattern"] = re.compile(rule["pattern"])
+            rules.append(rule)
+        self.line_classifier = LineClassifier(tuple(rules))
+
+        self.identifiers = grammar["identifiers"]
+        self.song_names = dict(zip(grammar["songs"], LOCALE_GRAMMARS["EN"]["songs"]))
+        self.heal_aliases = grammar["heal_aliases"]
+
+
+LOCALE_GRAMMARS = {} # {lang : grammar}, see register_locale()
+LANGUAGE_REGEXES = {} # {lang : compiled "detect" regex of its grammar}, in the order LogBuilder.language_check() tries them
+EVENT_GROUPS = {"dmg" : ("source", "target", "skill", "value"), "autoattack" : ("source", "target", "skill", "value"),
+    "heal" : ("source", "target", "skill", "value"), "buff_debuff" : ("timestamp", "entity", "identifier", "song"),
+    "skill_cast" : ("source", "skill")} # {kind : named groups of its event regex, in the order of its add_*_event() tuple}
+
+
+def register_locale(lang, grammar):
+    """Add a language that combat.logs are parsed in, or replace one. grammar is data, compiled once per process by Locale:
+    {"detect" : regex matching the lines of the language from their start, languages are tried in the order registered,
+    "pve_bosses" : (boss names without a space, their lines are discarded,), "unwanted_events" : (substrings of discarded lines,),
+    "rules" : LineClassifier rules after the discard rule of pve_bosses and unwanted_events, any "pattern" as a regex string,
+    "events" : {kind : regex string, for every kind of EVENT_GROUPS, with its named groups in any order},
+    "identifiers" : {captured buff_debuff identifier : "gained", "struck" (gained) or "s" (lost)},
+    "songs" : (names of LogBuilder's BUFFS then DEBUFFS in the language, in the order of EN's),
+    "heal_potions" : (lowercased self-healing skills,), "heal_pets" : (lowercased skills of pets healing their owner,),
+    "heal_aliases" : {substring : heal skill name, replacing a heal skill containing it, the first in order if several}}
+    """
+    for kind, names in EVENT_GROUPS.items():
+        if kind not in grammar["events"]:
+            raise ValueError("Locale %s has no event regex for %s" % (lang, kind))
+        missing = set(names).difference(re.compile(grammar["events"][kind]).groupindex)
+        if len(missing) > 0:
+            raise ValueError("Locale %s's %s regex has no group named %s" % (lang, kind, sorted(missing)))
+    LOCALE_GRAMMARS[lang] = grammar
+    LANGUAGE_REGEXES[lang] = re.compile(grammar["detect"])
+    Locale.compiled.pop(lang, None)
+
+
+register_locale("EN", {
+    "detect" : r"^.+?\|r(?:\'s)? [a-z]",
+    "pve_bosses" : ('Kraken', 'Meina', 'Glenn', 'Anthalon', 'Charybdis'), # only need provide bosses without a space in the name
+    "unwanted_events" : ("|r is casting |", "|r mana.", "|r! Attack Missed.", "|r! Attack Immune!",
+        "|r! Attack Evaded," , "|cffff00000|r", "|r took", "attacked |r"), # "|cffff00000|r": 0 dmg event (5 zeroes instead of 4)
+        # "attacked |r" somehow, you can have a target of a dmg event that is 0-length.
+    # no_spaces_in_names_regex = r"(?:\[.+\] \S+\|r)(?: attacked \S+\|r| targeted \S+\|r| successfully| is casting| gained| was|\'s)"
+    "rules" : (
+        {"kind" : "buff_debuff", "any_of" : ("|r's", "was struck by a", "gained the buff:")},
+        {"kind" : "skill_cast", "any_of" : ("|r successfully cast |",)},
+        {"kind" : "dmg", "all_of" : ("|r attacked ", "|r using |")},
+        {"kind" : "heal", "any_of" : ("|r targeted ",)},
+        {"kind" : "autoattack", "any_of" : ("|r attacked ",)}),
+    "events" : {
+        "dmg" : r'\] (?P<source>.+)\|r attacked (?P<target>.+)\|r using \|cff25fcff(?P<skill>.*)\|r.+\|cffff0000-(?P<value>\d+)\|r',
+        "autoattack" : r"\] (?P<source>.+)\|r attacked (?P<target>.+)\|r(?|! Attack (?:Blocked|Parried), resulting in \|cffff(?P<skill>0000)-(?P<value>\d+)\|r"
+            r"| and caused \|cffff(?P<skill>0000)-(?P<value>\d+)\|r)",
+        "heal" : r'\] (?P<source>.+)\|r targeted (?P<target>.+)\|r using \|cff25fcff(?P<skill>.*)\|r to restore \|cff00ff00(?P<value>\d+)\|r health',
+        "buff_debuff" : r"\[(?P<timestamp>.+)\] (?|(?|(?P<entity>.+)\|r (?P<identifier>gained) the buff: \|cff25fcff(?P<song>.+)\|r"
+            r"|(?P<entity>.+)\|r was (?P<identifier>struck) by a \|cff25fcff(?P<song>.+)\|r debuff!)|(?P<entity>.+)\|r\'(?P<identifier>s) \|cff25fcff(?P<song>.+)\|r)",
+        "skill_cast" : r"\] (?P<source>.+)\|r successfully cast \|cff25fcff(?P<skill>.+)\|r!"},
+    "identifiers" : {"gained" : "gained", "struck" : "struck", "s" : "s"},
+    "songs" : ('bulwark ballad (rank 2)', 'bloody chantey (rank 2)', 'quickstep (rank 5)',
+        'unguarded', 'lethargy (bloody chantey)', 'unpleasant sensation (quickstep)'), # maintain order here
+    "heal_potions" : ('healing potion', 'minor healing potion', 'found wild ginseng!', 'healing grimoire',
+        'phoenix tears tincture', 'enhanced judge\'s longing', 'orange goblet of honor', 'sand soulshard',
+        'absorb damage', 'earth lunafrost', 'blessed rune: zena basta 6', 'revitalizing cheer', 'health regen food',
+        "judge's longing", 'absorb lifeforce', 'flame conversion shield (rank 5)', "wind soulshard",
+        "conversion shield (rank 5)", "for the battle"),
+    "heal_pets" : ('phoenix flame',), # pets that provide self-healing to the owner (target is owner, source is pet)
+    "heal_aliases" : {"orange goblet of honor" : "orange goblet of honor"}}) # goblet can have many ranks appended
+
+register_locale("RU", {
+    "detect" : r"^.+?\|r(?:\:)? [\u0400-\u04FF]",
+    "pve_bosses" : ("Ксанатос", "Кракен"),
+    "unwanted_events" : (             "маны.", "Промах!", "невосприимчивостью ",
+        "уклоняется.", "|cffff00000|r", "падение", "(|", "Восстанавливает по |nc;5000 очков работы|r."), # (| = fall dmg or similar
+        # "Восстанавливает по |nc;5000 очков работы|r."? :pensive: this breaks regex formating and its just the 5k labor pot
+    # no_spaces_in_names_regex = r"\] \S+\|r(?|: применено умение| применяет умение «\|.+\|r»\. \S+\|r |: наложен |: эффект | атакует\. \S+\|r п)"
+    "rules" : (
+        # is casting: the only difference between is casting or has cast is a colon...
+        {"kind" : "discard", "all_of" : ("|r применяет умение «|cff25fcff",), "pattern" : r"\] .+\|r применяет умение «\|cff25fcff[^\|]+(?:\|r»)?\.?$"},
+        {"kind" : "buff_debuff", "any_of" : (": наложен", "эффект ")},
+        {"kind" : "skill_cast", "any_of" : (": применено умение",)},
+        {"kind" : "dmg", "any_of" : ("снижается на", "блокирует ", "парирует "), "none_of" : (" атакует",)},
+        {"kind" : "heal", "any_of" : ("восстанавливает ",)},
+        {"kind" : "autoattack", "any_of" : (" атакует",)}),
+    "events" : {
+        "dmg" : r"\] (?P<source>.+)\|r применяет умение «\|cff25fcff(?P<skill>.+)\|r»\. (?P<target>.+?)\|r .*-(?P<value>\d+)\|r ед\.",
+        "autoattack" : r"\] (?P<source>.+)\|r атакует.*\. (?P<target>.+)\|r .*\|cffff(?P<skill>0000)-(?P<value>\d+)\|r",
+        "heal" : r"\] (?P<source>.+)\|r применяет умение «\|cff25fcff(?P<skill>.+)\|r»\. (?P<target>.+)\|r восстанавливает \|cff00ff00(?P<value>\d+)\|r .*\.",
+        "buff_debuff" : r"\[(?P<timestamp>.+)\] (?P<entity>.+)\|r: (?|(?P<identifier>наложен) (?:усиливающий|ослабляющий) эффект «\|cff25fcff(?P<song>.+)\|r»\."
+            r"|(?P<identifier>эффект) «\|cff25fcf(?P<song>.+)\|r» рассеялся.)",
+        "skill_cast" : r"\] (?P<source>.+)\|r: применено умение «\|cff25fcff(?P<skill>[^\|\n]+)"},
+    "identifiers" : {"наложен" : "gained", "эффект" : "s"},
+    "songs" : ("Гимн земли II","Рапсодия битвы II","Походный марш V",
+        "Уязвимость","Аура беспомощности","Замедление"), # maintain order here
+    "heal_potions" : ("исцеление", 'благосклонность акритеса ii', "благосклонность акритеса i", "письмена войны",
+        "надежда луны", "непреодолимое сопротивление", "кража жизни", "целебные эликсиры", "сансам",
+        "энергетический щит v", "гримуар тайного знания", """слова силы: а'ше"н'валь vi""",
+        "энергия забытого сада", "восстанавливающая здоровье еда"), # RU has unverified (by me) translations
+    "heal_pets" : ("",),
+    "heal_aliases" : {"orange goblet of honor" : "orange goblet of honor"}})
+
+
+class LineClassifier():
+    """Classifier of combat.log lines into event kinds, built by Locale.
+    The rules are compiled once into a Python function (classify) that is the chain of `substring in line` checks one would write
+    by hand: each check is a single operation, unlike any() over a tuple of substrings or a regex scanning the line for all of them.
+    """
+    def __init__(self, rules):
+        """rules = ({"kind" : str, "any_of" : tuple, "all_of" : tuple, "none_of" : tuple, "pattern" : compiled regex}, ...)
+        Rules are tried in order, the first one satisfied gives the kind of the line. Every key but "kind" is optional.
+        any_of/all_of/none_of are substrings of the line, "pattern" is searched in the line only if the rest is satisfied.
+        """
+        self.rules = rules
+        namespace = {} # patterns' search methods, by name in the source
+        self.source = ['def classify(line):', '    """Returns the kind of the given line as given by the rules, None if no rule is satisfied."""']
+        for n, rule in enumerate(rules):
+            checks = []
+            if "any_of" in rule:
+                checks.append("(%s)" % (" or ".join("%r in line" % (marker,) for marker in rule["any_of"]) or "False"))
+            checks.extend("%r in line" % (marker,) for marker in rule.get("all_of", ()))
+            checks.extend("%r not in line" % (marker,) for marker in rule.get("none_of", ()))
+            if rule.get("pattern") is not None:
+                namespace["pattern_%s" % (n)] = rule["pattern"].search
+                checks.append("pattern_%s(line) is not None" % (n))
+            self.source.append("    if %s:" % (" and ".join(checks) or "True"))
+            self.source.append("        return %r" % (rule["kind"]))
+        self.source.append("    return None")
+
+        exec("\n".join(self.source), namespace)
+        self.classify = namespace["classify"] # a plain function, not a method: one call per line instead of two
+
+
+PLAYER_ALLOW_LIST = set() # entity names always counted as players, e.g. a player name the rules get wrong
+PLAYER_DENY_LIST = set() # entity names never counted as players, e.g. NPCs or pets without a space in their name
+
+
+class EntityRegistry():
+    """Entity names (sources, targets) interned to ids, each distinct name is classified as a player or not only once.
+    The classification is stored in the low bits of the id (PLAYER, BOSS), so filtering an entity is one dict lookup.
+    Rules, first match wins: deny list (not a player), allow list (player), pve boss of any locale, space in the name (NPC).
+    """
+    __slots__ = ("entity_ids", "names", "allow", "deny", "bosses")
+    PLAYER = 1
+    BOSS = 2
+    FLAG_BITS = 2
+
+    def __init__(self, allow=None, deny=None):
+        """allow, deny -- iterables of names, PLAYER_ALLOW_LIST and PLAYER_DENY_LIST if None"""
+        self.entity_ids = {} # {name : index << FLAG_BITS | flags}
+        self.names = [] # names by index
+        self.allow = frozenset(PLAYER_ALLOW_LIST if allow is None else allow)
+        self.deny = frozenset(PLAYER_DENY_LIST if deny is None else deny)
+        self.bosses = frozenset(boss for grammar in LOCALE_GRAMMARS.values() for boss in grammar["pve_bosses"])
+
+    def __len__(self):
+        return len(self.names)
+
+    def classify(self, name) -> int:
+        """Returns the flags of an entity name from the rules, see the class docstring."""
+        if name in self.deny:
+            return 0
+        if name in self.allow:
+            return self.PLAYER
+        if name in self.bosses:
+            return self.BOSS
+        if " " in name:
+            return 0
+        return self.PLAYER
+
+    def entity_id(self, name) -> int:
+        """Returns the id of an entity name, classifying and adding it if needed. flags = id & (1 << FLAG_BITS) - 1"""
+        try:
+            return self.entity_ids[name]
+        except(KeyError):
+            entity_id = self.entity_ids[name] = len(self.names) << self.FLAG_BITS | self.classify(name)
+            self.names.append(name)
+            return entity_id
+
+    def is_player(self, name) -> int:
+        """Returns PLAYER (truthy) if the entity name is a player, 0 otherwise."""
+        try:
+            return self.entity_ids[name] & self.PLAYER
+        except(KeyError):
+            return self.entity_id(name) & self.PLAYER
 
-        self.pve_bosses = ("Ксанатос", "Кракен")
-        self.unwanted_events = (             "маны.", "Промах!", "невосприимчивостью ",
-            "уклоняется.", "|cffff00000|r", "падение", "(|", "Восстанавливает по |nc;5000 очков работы|r.") # (| = fall dmg or similar
-            # "Восстанавливает по |nc;5000 очков работы|r."? :pensive: this breaks regex formating and its just the 5k labor pot
-        # self.no_spaces_in_names_regex = re.compile(r"\] \S+\|r(?|: применено умение| применяет умение «\|.+\|r»\. \S+\|r |: наложен |: эффект | атакует\. \S+\|r п)")
-        self.damage_regex = re.compile(r"\] (.+)\|r применяет умение «\|cff25fcff(.+)\|r»\. (.+?)\|r .*-(\d+)\|r ед\.")
-        self.auto_attack_regex = re.compile(r"\] (.+)\|r атакует.*\. (.+)\|r .*\|cffff(0000)-(\d+)\|r")
-        self.heal_regex = re.compile(r"\] (.+)\|r применяет умение «\|cff25fcff(.+)\|r»\. (.+)\|r восстанавливает \|cff00ff00(\d+)\|r .*\.")
-        self.buff_debuff_regex = re.compile(r"\[(.+)\] (.+)\|r: (?|(наложен) (?:усиливающий|ослабляющий) эффект «\|cff25fcff(.+)\|r»\.|(эффект) «\|cff25fcf(.+)\|r» рассеялся.)")
-        self.skill_cast_regex = re.compile(r"\] (.+)\|r: применено умение «\|cff25fcff([^\|\n]+)")
 
-        self.is_casting_regex = re.compile(r"\] .+\|r применяет умение «\|cff25fcff[^\|]+(?:\|r»)?\.?$") # the only difference between is casting or has cast is a colon...
+class LogBuilder():
+    """Incrementally compiles combat.log lines into a LogStats object, used by main_log_builder().
+    Every line fed is parsed and added to the running totals straight away, no event lists are kept:
+    memory depends on the amount of distinct players and skills, not on the amount of lines.
+    Call build() at any time to obtain a sorted LogStats object, feeding can continue afterwards.
+    Builders of consecutive parts of a combat.log can be combined with merge(), see parallel_log_builder().
+    """
+    BUFFS = ('bulwark ballad (rank 2)', 'bloody chantey (rank 2)', 'quickstep (rank 5)')
+    DEBUFFS = ('unguarded', 'lethargy (bloody chantey)', 'unpleasant sensation (quickstep)')
 
+    def __init__(self, defer_songs=False, lang=None, record_events=False, entities=None):
+        """Running totals follow LogStats' formatting, but unsorted. See LogStats.__init__ 's docstring.
+        defer_songs -- keep the buff/debuff events of songs in song_events instead of tracking them, for a later merge()
+        lang -- language the first line is parsed with, detected from the line if None
+        record_events -- also keep every event added in event_columns, an EventColumns object written to event caches
+        entities -- EntityRegistry telling players from NPCs, a new one with the default lists if None. Events are
+        recorded in event_columns whatever their entities, so a cache can be read again with other lists.
+        """
+        self.entities = EntityRegistry() if entities is None else entities
+        self.lang_current = Locale()
+        self.lang_current_str = ""
+        self.langs_contained = set()
+        if lang is not None:
+            self.set_language(lang)
+
+        # combat.log timestamps are in MM/DD/YY client's system time, kept as strings until build()
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.line_count = 0 # lines fed, combat.log lines or not
+
+        self.event_columns = EventColumns() if record_events else None
+
+        self.damage_dealt = {}
+        self.damage_received = {}
+        self.healing_dealt = {}
+        self.healing_self_items = {}
+        self.player_skills = {}
+        self.skill_players = {}
+
+        self.defer_songs = defer_songs
+        self.song_events = EventColumns() # buff/debuff events (kind 2) of tracked songs if defer_songs, song lowercased
+        self.first_song_time = None # time of the first buff/debuff event, tracked song or not
+        self.song_timer = None # time of the last tracked buff/debuff event
+        self.log_elapsed_time = 0
+        self.tracking_temporary = {} # {str Entity : {str Song: (int start time, int song_count), ...}}, songs currently up
+        self.tracking_order = {} # {str Entity : int}, order in which entities were first tracked
+        self.song_expiry_queue = [] # heap of (int expiry time, int song_count, str Entity, str Song)
+        self.song_count = 0 # identifies each song application, a refreshed song leaves a stale entry in the queue
+        self.tracked_songs_total_buffs = {} # {str Entity : {str Song: int Seconds, str Song: int Seconds, ...}}
+        self.tracked_songs_total_debuffs = {} # ditto
+
+    def __getstate__(self):
+        """Compiled locales are not sent along when pickling, see __setstate__"""
+        state = self.__dict__.copy()
+        del state["lang_current"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lang_current = Locale()
+        if self.lang_current_str != "":
+            self.lang_current.use(self.lang_current_str)
+
+    def feed_lines(self, lines):
+        """Feed an iterable of lines (a list, an open file...) to feed_line()."""
+        for line in lines:
+            self.feed_line(line)
+
+    def feed_line(self, line):
+        """Parse a single combat.log line, adding its event to the running totals.
+        Lines without a combat.log timestamp are ignored. A line is parsed in the current language, or if no rule of it
+        classifies the line, in the language found by language_check(). Raises ValueError if neither can parse it.
+        """
+        self.line_count += 1
+        if line[:1] != "[" or line[3:4] != "/":
+            return None
 
-def generate_output(log_stats, perf_counter_start = 0, user_file = None,
-    custom_text_field = "undefined_custom_text_field", write_output = True):
-    """Generate output from a LogStats object. If user_file is not None, will copy it to output folder."""
+        if self.first_timestamp is None:
+            self.first_timestamp = line[1:18]
+        self.last_timestamp = line[1:18]
 
-    log_start = time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_start_time))
-    log_end = time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_end_time))
+        kind = None if self.lang_current_str == "" else self.classify_line(line)
+        if kind is None:
+            lang = self.language_check(line)
+            if lang is None:
+                raise ValueError("cannot find lang: " + line)
+            if lang == self.lang_current_str:
+                raise ValueError("Language changed despite not being required, infinite loop: %s" % (line))
+            self.set_language(lang)
+            kind = self.classify_line(line)
+            if kind is None:
+                raise ValueError("Language changed despite not being required, infinite loop: %s" % (line))
 
-    output_filenames = []
+        self.sort_log_events(line, kind)
 
-    dmg_log_simple = build_simple_dict(log_stats.dmg_log)
-    heal_log_simple = build_simple_dict(log_stats.heal_log)
-    received_dmg_log_simple = build_simple_dict(log_stats.received_dmg_log)
-    item_heal_log_simple = build_simple_dict(log_stats.self_heal_log)
+    def classify_line(self, line) -> "str | None":
+        """Returns the kind of a line in the current language, see LineClassifier.classify()"""
+        return self.lang_current.line_classifier.classify(line)
 
-    dmg_graph = horizontal_bar_plot(dmg_log_simple, title='Outgoing Damage\n%s -- %s' % (log_start, log_end), x_label='Damage Given (no pve)', color='crimson', filename='Outgoing Damage.png')
-    if dmg_graph is not None:
-        output_filenames.append(dmg_graph)
+    def language_check(self, line) -> "str | None":
+        """Returns the language of the provided string line (a key of LOCALE_GRAMMARS) from its formatting, None if it has none.
+        """
+        for lang, lang_regex in LANGUAGE_REGEXES.items():
+            if lang_regex.match(line) is not None:
+                return lang
+        return None
 
-    heal_graph = horizontal_bar_plot(heal_log_simple, title='Outgoing Healing\n%s -- %s' % (log_start, log_end), x_label='Healing Given', color='tab:green', filename='Outgoing Healing.png')
-    if heal_graph is not None:
-        output_filenames.append(heal_graph)
+    def set_language(self, lang):
+        """Parse the following lines in lang, one of Locale's languages"""
+        self.lang_current.use(lang)
+        self.langs_contained.add(lang)
+        self.lang_current_str = lang
 
-    received_dmg_graph = stacked_horizontal_bar_plot(received_dmg_log_simple, item_heal_log_simple, title='Received Damage & Self-Healing\n%s -- %s' % (log_start, log_end), x_label='Quantity')
-    if received_dmg_graph is not None:
-        output_filenames.append(received_dmg_graph)
+    def sort_log_events(self, line, kind):
+        """Checks a string line obtained from a combat.log, of the given kind (see classify_line()), in the current language.
+        parses it with the event regex of the kind into an event tuple, directly adding it to the running totals.
+        Raises AttributeError if the regex does not match the line.
+        """
+        if kind == "discard":
+            return None
 
-    song_buff_graph = complex_song_plot(log_stats.tracked_songs_total_buffs, True,
-        title='Time spent in songs (logged time = %s' % (log_stats.log_elapsed_time) + 's)\n%s -- %s' % (log_start, log_end),
-        y_label='Entity', y_limit=20, filename='Song Buffs.png')
-    if song_buff_graph is not None:
-        output_filenames.append(song_buff_graph)
+        lang_current = self.lang_current
+        event_regex, group_numbers = lang_current.event_regexes[kind]
+        event = event_regex.search(line).group(*group_numbers)
 
-    song_debuff_graph = complex_song_plot(log_stats.tracked_songs_total_debuffs, False,
-        title='Time spent charmed by songs (logged time = %s' % (log_stats.log_elapsed_time) + 's)\n%s -- %s' % (log_start, log_end),
-        y_label='Entity', y_limit=20, filename='Song Charms.png')
-    if song_debuff_graph is not None:
-        output_filenames.append(song_debuff_graph)
+        if kind == "buff_debuff":
+            timestamp, entity, identifier, song = event
+            self.add_buff_debuff_event((timestamp, entity, lang_current.identifiers[identifier],
+                lang_current.song_names.get(song, song), self.lang_current_str))
 
-    try:
-        os.unlink('Output.txt')
-    except(FileNotFoundError):
-        pass
+        elif kind == "skill_cast":
+            self.add_skill_cast_event(event + (self.lang_current_str,))
 
-    if write_output:
-        write_to_txt(True, custom_message="Combat.log times (based on log's client's system time):\nSTART: %s | END: %s\n%s | (~%s seconds elapsed)" %
-            (time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_start_time)),
-            time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_end_time)),
-            custom_text_field, log_stats.log_elapsed_time))
+        elif kind == "heal":
+            heal_event_line = event + (self.lang_current_str,)
+            for substring, heal_skill in lang_current.heal_aliases.items(): # e.g. goblet can have many ranks appended
+                if substring in heal_event_line[2]:
+                    heal_event_line = heal_event_line[:2] + (heal_skill,) + heal_event_line[3:]
+                    break
+            self.add_heal_event(heal_event_line)
+
+        else: # dmg, autoattack
+            self.add_dmg_event(event + (self.lang_current_str,))
+
+    def add_dmg_event(self, event):
+        """Adds a dmg event to player and dmg total, player and dmg taken total.
+        event format: ("player", "target", "method", "value", "lang")
+        Like every add_*_event(), returns True if the event was added, None if it was filtered out (e.g. non-player names).
+        """
+        value = int(event[3])
+        if self.event_columns is not None:
+            self.event_columns.add(0, event[0], event[1], event[2], value, log_timestamp_to_epoch(self.last_timestamp), event[4])
+
+        return self.add_dmg(event[0], event[1], event[2].lower(), value)
+
+    def add_dmg(self, source, target, method, value):
+        """Adds a dmg event given its method already lowercased and its value as an int, see add_dmg_event()"""
+        is_player = self.entities.is_player
+        if not is_player(source) or not is_player(target):
+            return None
+
+        damage_dealt = self.damage_dealt.setdefault(source, {"total" : 0})
+        damage_dealt.setdefault(method, 0)
+
+        damage_dealt["total"] += value
+        damage_dealt[method] += value
+
+        damage_received = self.damage_received.setdefault(target, {"total" : 0})
+        damage_received.setdefault(method, 0)
+
+        damage_received["total"] += value
+        damage_received[method] += value
+        return True
+
+    def add_heal_event(self, event): # for healing-related sources, especially to ensure healing and selfhealing is separated.
+        """Adds a heal event to player and heal total, or player and item/buffs self-healing total
+        (not self-targeting outgoing healing like vitalism, i.e rather healing pots, orange goblet, phoenix powerstone pet...).
+        event format: ("player", "target", "method", "value", "lang")
+        """
+        value = int(event[3])
+        if self.event_columns is not None:
+            self.event_columns.add(1, event[0], event[1], event[2], value, log_timestamp_to_epoch(self.last_timestamp), event[4])
+
+        return self.add_heal(event[0], event[1], event[2].lower(), value, event[4])
+
+    def add_heal(self, source, target, method, value, lang):
+        """Adds a heal event given its method already lowercased and its value as an int, see add_heal_event()"""
+        is_player = self.entities.is_player
+        if not is_player(source) or not is_player(target):
+            return None
+
+        if method in self.lang_current.all_heal_potions[lang]:
+            healing = self.healing_self_items.setdefault(source, {"total" : 0})
+
+        elif method not in self.lang_current.all_heal_pets[lang]: # normal heal
+            healing = self.healing_dealt.setdefault(source, {"total" : 0})
+
+        else: # healing pets
+            healing = self.healing_self_items.setdefault(target, {"total" : 0})
+
+        healing.setdefault(method, 0)
+        healing["total"] += value
+        healing[method] += value
+        return True
+
+    def add_buff_debuff_event(self, event):
+        """Adds a buff/debuff event to the song trackers, {player : {song : timeinint, song1 : timeinint, ...}, ...}.
+        One tracks the buff versions of songs, the other tracks the debuff versions. Also counts combatlog elapsed time.
+        event format: ("timestamp", "entity", "identifier", "song", "lang")
+        """
+        return self.add_song_event(log_timestamp_to_epoch(event[0]), event[1], event[2], event[3])
+
+    def add_song_event(self, event_time, entity, identifier, song):
+        """Adds a buff/debuff event given its time in seconds since epoch, see add_buff_debuff_event()"""
+        if self.first_song_time is None:
+            self.first_song_time = event_time
 
-        if len(log_stats.langs_contained) > 1:
-            write_to_txt(True, custom_message="More than one language in combat.log! %s" % (log_stats.langs_contained))
+        if self.event_columns is not None:
+            self.event_columns.add(2, entity, None, song, EventColumns.IDENTIFIER_CODES[identifier], event_time, None)
+
+        if not self.entities.is_player(entity):
+            return None
+
+        # identifier: if 's', lost buff or debuff. if 'gained' or 'struck', gained buff or debuff.
+        song = song.lower()
+
+        if song not in (self.BUFFS + self.DEBUFFS):
+            return None
+
+        if self.defer_songs:
+            self.song_events.add(2, entity, None, song, EventColumns.IDENTIFIER_CODES[identifier], event_time, None)
         else:
-            write_to_txt(True, custom_message='combat.log language is %s' % (log_stats.langs_contained))
-        write_to_txt(False, title='OUTGOING DMG', dict_container=log_stats.dmg_log)
-        write_to_txt(False, title='RECEIVED DMG', dict_container=log_stats.received_dmg_log)
-        write_to_txt(False, title='OUTGOING HEALING', dict_container=log_stats.heal_log)
-        write_to_txt(False, title='SELFHEALING', dict_container=log_stats.self_heal_log)
-        write_to_txt(False, title='SONG BUFF STATS', dict_container=log_stats.tracked_songs_total_buffs)
-        write_to_txt(False, title='SONG CHARM STATS', dict_container=log_stats.tracked_songs_total_debuffs)
-        write_to_txt(False, title='SKILLS USED BY PLAYER (experimental)', dict_container=log_stats.tracked_player_skills)
-        write_to_txt(False, title='PLAYERS THAT USED A SKILL (experimental)', dict_container=log_stats.tracked_skill_players)
+            self.track_song(event_time, entity, identifier, song)
+        return True
+
+    def track_song(self, event_time, entity, identifier, song):
+        """Adds a buff/debuff event of a tracked song on a player to the song trackers, see add_buff_debuff_event()"""
+        if self.song_timer is None:
+            self.song_timer = self.first_song_time
+
+        self.log_elapsed_time += event_time - self.song_timer
+        self.song_timer = event_time
+
+        self.expire_songs(event_time)
+
+        tracking_temporary = self.tracking_temporary
+        if entity not in tracking_temporary:
+            tracking_temporary[entity] = {}
+            self.tracking_order[entity] = len(self.tracking_order)
+
+        if identifier == 'gained' or identifier == 'struck': # a refresh restarts the song without adding its time
+            self.song_count += 1
+            tracking_temporary[entity][song] = (event_time, self.song_count)
+            heapq.heappush(self.song_expiry_queue, (event_time + 5, self.song_count, entity, song))
+
+        elif identifier == 's':
+            try:
+                song_start_time = tracking_temporary[entity].pop(song)[0]
+                self.tracked_songs_total_addition(entity, song, event_time - song_start_time)
+            except(KeyError): # if mismatch occurs: de/buff loss event without ever acquiring it
+                pass
+
+    def expire_songs(self, event_time):
+        """Adds 5 seconds for every song still up that started 5 or more seconds before event_time, then stops tracking it.
+        songs cannot be over 5 seconds in length + handles mismatch. Only songs due are looked at, through the expiry queue.
+        """
+        song_expiry_queue = self.song_expiry_queue
+        tracking_temporary = self.tracking_temporary
+        expired = []
+        while song_expiry_queue and song_expiry_queue[0][0] <= event_time:
+            expiry_time, song_count, entity, song = heapq.heappop(song_expiry_queue)
+            if song in tracking_temporary[entity] and tracking_temporary[entity][song][1] == song_count: # else refreshed or ended
+                expired.append((entity, song))
+
+        if len(expired) > 1: # same order as tracking_temporary, it decides the order of new keys in the totals
+            expired.sort(key=lambda x: (self.tracking_order[x[0]], tuple(tracking_temporary[x[0]]).index(x[1])))
+
+        for entity, song in expired:
+            del tracking_temporary[entity][song]
+            self.tracked_songs_total_addition(entity, song, 5)
+
+    def tracked_songs_total_addition(self, entity, sub_dict_key, sub_dict_value):
+        if sub_dict_key in self.BUFFS:
+            dictionary_reference = self.tracked_songs_total_buffs
+        else:
+            dictionary_reference = self.tracked_songs_total_debuffs
+
+        dictionary_reference.setdefault(entity, {})
+
+        if sub_dict_key in dictionary_reference[entity]:
+            dictionary_reference[entity][sub_dict_key] += sub_dict_value
+        else:
+            dictionary_reference[entity].update({sub_dict_key: sub_dict_value})
+
+    def add_skill_cast_event(self, event):
+        """Adds a skill cast event to all skills used per player and all players that used a skill.
+        event format: ("player", "skill", "lang")
+        """
+        if self.event_columns is not None:
+            self.event_columns.add(3, event[0], None, event[1], 1, log_timestamp_to_epoch(self.last_timestamp), event[2])
+
+        return self.add_skill_cast(event[0], event[1].lower())
+
+    def add_skill_cast(self, entity, skill):
+        """Adds a skill cast event given its skill already lowercased, see add_skill_cast_event()"""
+        if not self.entities.is_player(entity):
+            return None
+
+        player_skills = self.player_skills.setdefault(entity, {})
+        skill_players = self.skill_players.setdefault(skill, {})
+
+        player_skills.setdefault(skill, 0)
+        skill_players.setdefault(entity, 0)
+
+        player_skills[skill] += 1
+        skill_players[entity] += 1
+        return True
+
+    def feed_event_columns(self, event_columns, group_by="dict"):
+        """Add every event of an EventColumns object, as they were added when recorded. No line is parsed,
+        each distinct string is lowercased once and the events are not recorded again in event_columns.
+        group_by -- "dict" adds events one by one, "numpy" uses feed_event_columns_numpy()
+        """
+        if group_by == "numpy":
+            return self.feed_event_columns_numpy(event_columns)
+
+        strings = event_columns.vocabulary.strings
+        lowered = event_columns.vocabulary.lowered()
+        columns = (event_columns.kind, event_columns.source, event_columns.target, event_columns.skill,
+            event_columns.value, event_columns.timestamp, event_columns.lang)
+
+        for kind, source, target, skill, value, timestamp, lang in zip(*columns):
+            if kind == 0:
+                self.add_dmg(strings[source], strings[target], lowered[skill], value)
+            elif kind == 1:
+                self.add_heal(strings[source], strings[target], lowered[skill], value, strings[lang])
+            elif kind == 2:
+                self.add_song_event(timestamp, strings[source], EventColumns.IDENTIFIERS[value], strings[skill])
+            else:
+                self.add_skill_cast(strings[source], lowered[skill])
+
+    def feed_event_columns_numpy(self, event_columns):
+        """feed_event_columns() computing the dmg, heal and skill cast totals with a vectorized group-by (numpy.unique and
+        numpy.bincount) over the columns instead of updating the dicts per event. Needs numpy, see load_numpy().
+        Keys are added in order of first appearance, so the totals and their ties sort as with the dict path.
+        Buff/debuff events are still tracked one by one, in order.
+        """
+        np = load_numpy()
+        if len(event_columns) == 0:
+            return None
+
+        strings = event_columns.vocabulary.strings
+        lowered_ids = {} # {lowercased string : id}, strings differing only by case share an id
+        lowered_id = np.array([lowered_ids.setdefault(string, len(lowered_ids)) for string in event_columns.vocabulary.lowered()] + [-1])
+        lowered_strings = list(lowered_ids)
+        not_player = np.ones(len(strings) + 1, dtype=bool) # index -1 (no string) is never a player
+        for string_id in np.unique(np.concatenate((event_columns.source, event_columns.target))).tolist():
+            if string_id != -1:
+                not_player[string_id] = not self.entities.is_player(strings[string_id])
+
+        kind, source, target, skill, value, timestamp, lang = (np.array(getattr(event_columns, name)) for name, typecode in EventColumns.COLUMNS)
+        skill = lowered_id[skill]
+
+        def add_group_totals(dictionary, outer, outer_strings, inner, inner_strings, values=None, total=False):
+            """Sum values (1 per event if None) into dictionary[outer][inner] per (outer, inner) pair, pairs in order of first appearance"""
+            if len(outer) == 0:
+                return None
+            keys = outer.astype(np.int64) * len(inner_strings) + inner
+            unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            sums = np.bincount(inverse.reshape(-1), weights=values, minlength=len(unique_keys)) # float64, exact below 2**53
+
+            for n in np.argsort(first_index).tolist():
+                outer_key, inner_key = divmod(int(unique_keys[n]), len(inner_strings))
+                nested = dictionary.setdefault(outer_strings[outer_key], {"total" : 0} if total else {})
+                if total:
+                    nested["total"] += int(sums[n])
+                inner_string = inner_strings[inner_key]
+                nested[inner_string] = nested.get(inner_string, 0) + int(sums[n])
+
+        players = ~not_player[source] & ~not_player[target]
+
+        dmg = (kind == 0) & players
+        add_group_totals(self.damage_dealt, source[dmg], strings, skill[dmg], lowered_strings, value[dmg], total=True)
+        add_group_totals(self.damage_received, target[dmg], strings, skill[dmg], lowered_strings, value[dmg], total=True)
+
+        heal = (kind == 1) & players
+        heal_keys = skill[heal].astype(np.int64) * (len(strings) + 1) + lang[heal]
+        unique_heal_keys, inverse = np.unique(heal_keys, return_inverse=True)
+        categories = [] # per distinct (skill, lang): 0 healing potion, 1 normal heal, 2 healing pet
+        for heal_key in unique_heal_keys.tolist():
+            method, heal_lang = lowered_strings[heal_key // (len(strings) + 1)], strings[heal_key % (len(strings) + 1)]
+            if method in self.lang_current.all_heal_potions[heal_lang]:
+                categories.append(0)
+            elif method not in self.lang_current.all_heal_pets[heal_lang]:
+                categories.append(1)
+            else:
+                categories.append(2)
+        category = np.array(categories, dtype=np.int8)[inverse.reshape(-1)]
+        heal_source, heal_target, heal_skill, heal_value = source[heal], target[heal], skill[heal], value[heal]
+
+        normal = category == 1
+        add_group_totals(self.healing_dealt, heal_source[normal], strings, heal_skill[normal], lowered_strings, heal_value[normal], total=True)
+        # potions count for their drinker, pets for their healed owner, both in the same dict
+        add_group_totals(self.healing_self_items, np.where(category == 2, heal_target, heal_source)[~normal], strings,
+            heal_skill[~normal], lowered_strings, heal_value[~normal], total=True)
+
+        skill_cast = (kind == 3) & ~not_player[source]
+        add_group_totals(self.player_skills, source[skill_cast], strings, skill[skill_cast], lowered_strings)
+        add_group_totals(self.skill_players, skill[skill_cast], lowered_strings, source[skill_cast], strings)
+
+        song = kind == 2
+        for event_time, entity, identifier, song_skill in zip(timestamp[song].tolist(), source[song].tolist(),
+            value[song].tolist(), np.array(event_columns.skill)[song].tolist()):
+            self.add_song_event(event_time, strings[entity], EventColumns.IDENTIFIERS[identifier], strings[song_skill])
+
+    def merge(self, other):
+        """Adds the running totals of another LogBuilder, fed with the lines that follow the ones fed to this one.
+        Songs deferred by other are tracked now, in order. Songs it tracked itself are added as they are,
+        songs still up at the end of this builder's lines are then never completed.
+        """
+        if other.first_timestamp is None:
+            return None
+        if self.first_timestamp is None:
+            self.first_timestamp = other.first_timestamp
+        self.last_timestamp = other.last_timestamp
+
+        self.line_count += other.line_count
+        self.langs_contained.update(other.langs_contained)
+        if self.lang_current_str != other.lang_current_str:
+            self.lang_current.use(other.lang_current_str)
+            self.lang_current_str = other.lang_current_str
+
+        def merge_nested_dict(dictionary, other_dictionary):
+            """Sum other_dictionary's nested values into dictionary's, new keys go last like first seen keys"""
+            for k, other_nested in other_dictionary.items():
+                nested = dictionary.setdefault(k, {})
+                for m, value in other_nested.items():
+                    nested[m] = nested.get(m, 0) + value
+
+        merge_nested_dict(self.damage_dealt, other.damage_dealt)
+        merge_nested_dict(self.damage_received, other.damage_received)
+        merge_nested_dict(self.healing_dealt, other.healing_dealt)
+        merge_nested_dict(self.healing_self_items, other.healing_self_items)
+        merge_nested_dict(self.player_skills, other.player_skills)
+        merge_nested_dict(self.skill_players, other.skill_players)
+        merge_nested_dict(self.tracked_songs_total_buffs, other.tracked_songs_total_buffs)
+        merge_nested_dict(self.tracked_songs_total_debuffs, other.tracked_songs_total_debuffs)
+        self.log_elapsed_time += other.log_elapsed_time
+
+        if self.first_song_time is None:
+            self.first_song_time = other.first_song_time
+        song_events = other.song_events
+        strings = song_events.vocabulary.strings
+        for event_time, entity, identifier, song in zip(song_events.timestamp, song_events.source, song_events.value, song_events.skill):
+            if self.defer_songs:
+                self.song_events.add(2, strings[entity], None, strings[song], identifier, event_time, None)
+            else:
+                self.track_song(event_time, strings[entity], EventColumns.IDENTIFIERS[identifier], strings[song])
+
+    def build(self) -> LogStats:
+        """Returns a filled LogStats object with sorted copies of the running totals."""
+        if self.first_timestamp is None:
+            raise IndexError("Could not find any lines that match format of a combat.log.")
+
+        log_start_time = log_timestamp_to_epoch(self.first_timestamp)
+        log_end_time = log_timestamp_to_epoch(self.last_timestamp)
+
+        if log_start_time > log_end_time:
+            raise ValueError("Combat.log's last line has a timestamp earlier than its first line. Is the file edited manually?\n start: %s | end: %s"
+                % (log_start_time, log_end_time))
+
+        log_stats = LogStats()
+
+        log_stats.dmg_log = self.damage_dealt
+        log_stats.received_dmg_log = self.damage_received
+
+        log_stats.heal_log = self.healing_dealt
+        log_stats.self_heal_log = self.healing_self_items
+
+        log_stats.tracked_songs_total_buffs = self.tracked_songs_total_buffs
+        log_stats.tracked_songs_total_debuffs = self.tracked_songs_total_debuffs
+        log_stats.log_elapsed_time = self.log_elapsed_time
+
+        log_stats.tracked_player_skills = self.player_skills
+        log_stats.tracked_skill_players = self.skill_players
+
+        log_stats.log_end_time = log_end_time
+        log_stats.log_start_time = log_start_time
+        log_stats.log_line_count = self.line_count
+        log_stats.langs_contained = set(self.langs_contained)
+
+        log_stats.sort() # replaces the running totals by sorted copies, they are left as they are
+        return log_stats
+
+
+class StageProfiler():
+    """Optional instrumentation, given to main_log_builder() and generate_output() as their profiler argument.
+    Records for each stage its wall time, amount of lines (or items) handled and peak memory allocated (tracemalloc),
+    and for each regex of the locales the amount of lines matched, discarded and unmatched. write() saves the results as JSON.
+    Peak memory is only recorded for the stages timed with stage(), not for the per line stages of ProfiledLogBuilder.
+    tracemalloc slows everything down while tracing: use trace_memory=False for truer timings.
+    """
+    def __init__(self, trace_memory=True):
+        """stages = {name : {"seconds" : float, "calls" : int, "lines" : int, "peak_memory" : int bytes or None}, ...}
+        regexes = {name : {"matched" : int, "discarded" : int, "unmatched" : int}, ...}
+        """
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.regexes = {}
+
+    def add_time(self, name, seconds, lines=1):
+        stage = self.stages.setdefault(name, {"seconds" : 0, "calls" : 0, "lines" : 0, "peak_memory" : None})
+        stage["seconds"] += seconds
+        stage["calls"] += 1
+        stage["lines"] += lines
+
+    @contextlib.contextmanager
+    def stage(self, name, lines=0):
+        """Context manager timing its block as a stage that handled the given amount of lines, peak memory included."""
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        perf_counter_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - perf_counter_start, lines)
+            if self.trace_memory:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                stage = self.stages[name]
+                stage["peak_memory"] = max(stage["peak_memory"] or 0, peak_memory)
+            if started_tracing:
+                tracemalloc.stop()
+
+    def count(self, regex_name, outcome):
+        """Count a line for a regex, outcome is "matched", "discarded" or "unmatched"."""
+        regex = self.regexes.setdefault(regex_name, {"matched" : 0, "discarded" : 0, "unmatched" : 0})
+        regex[outcome] += 1
+
+    def results(self) -> dict:
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = dict(stage, lines_per_sec=stage["lines"] / stage["seconds"] if stage["seconds"] > 0 else None)
+        return {"version" : 1, "python" : sys.version, "trace_memory" : self.trace_memory, "stages" : stages, "regexes" : self.regexes}
+
+    def write(self, filename=None):
+        """Write results() as JSON to filename (default PROFILE_FILENAME), must be a relative path."""
+        filename = PROFILE_FILENAME if filename is None else filename
+        if os.path.isabs(filename):
+            raise ValueError('Argument "filename" is an absolute path')
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.results(), f, ensure_ascii=False, indent=1)
+
+
+PROFILE_FILENAME = 'Profile.json'
+
+
+def profiler_stage(profiler, name, lines=0):
+    """profiler.stage(name, lines), or a context doing nothing if profiler is None."""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name, lines)
+
+
+class ProfiledLogBuilder(LogBuilder):
+    """LogBuilder recording its work in a StageProfiler, used by main_log_builder() when given a profiler. Per line stages:
+    language detection, classify, extract <kind> (the regex extraction of each event kind) and each add_*_event() aggregator.
+    Regex counts, per line: "line_classifier" matched an event kind, discarded the line (unwanted events, bosses...)
+    or had no rule for it. Each extraction regex matched an event that was added, an event that was filtered out (discarded)
+    or nothing at all (unmatched).
+    """
+    KIND_REGEXES = {"dmg" : "damage_regex", "autoattack" : "auto_attack_regex", "heal" : "heal_regex",
+        "buff_debuff" : "buff_debuff_regex", "skill_cast" : "skill_cast_regex"} # labels of Locale.event_regexes' regexes
+
+    def __init__(self, profiler, **kwargs):
+        self.profiler = profiler
+        self.kind = None # kind of the line being parsed
+        self.inner_time = 0 # time spent aggregating the line being parsed
+        self.added = None # return of the last add_*_event()
+        super().__init__(**kwargs)
+
+    def classify_line(self, line) -> "str | None":
+        perf_counter_start = time.perf_counter()
+        kind = super().classify_line(line)
+        self.profiler.add_time("classify", time.perf_counter() - perf_counter_start)
+        if kind is None:
+            self.profiler.count("line_classifier", "unmatched")
+        return kind
+
+    def language_check(self, line) -> "str | None":
+        perf_counter_start = time.perf_counter()
+        lang = super().language_check(line)
+        self.profiler.add_time("language detection", time.perf_counter() - perf_counter_start)
+        return lang
+
+    def sort_log_events(self, line, kind):
+        self.kind = kind
+        self.inner_time = 0
+        self.added = None
+        perf_counter_start = time.perf_counter()
+        try:
+            super().sort_log_events(line, kind)
+        except(AttributeError): # search().group() of a regex that found nothing
+            self.profiler.count(self.KIND_REGEXES[self.kind], "unmatched")
+            raise
+
+        if self.kind == "discard":
+            self.profiler.count("line_classifier", "discarded")
+            return None
+
+        self.profiler.count("line_classifier", "matched")
+        self.profiler.count(self.KIND_REGEXES[self.kind], "matched" if self.added else "discarded")
+        self.profiler.add_time("extract %s" % (self.kind), time.perf_counter() - perf_counter_start - self.inner_time)
+
+    def profiled_add_event(self, add_event, name, event):
+        perf_counter_start = time.perf_counter()
+        self.added = add_event(event)
+        seconds = time.perf_counter() - perf_counter_start
+        self.profiler.add_time(name, seconds)
+        self.inner_time += seconds
+        return self.added
+
+    def add_dmg_event(self, event):
+        return self.profiled_add_event(super().add_dmg_event, "add_dmg_event", event)
+
+    def add_heal_event(self, event):
+        return self.profiled_add_event(super().add_heal_event, "add_heal_event", event)
+
+    def add_buff_debuff_event(self, event):
+        return self.profiled_add_event(super().add_buff_debuff_event, "add_buff_debuff_event", event)
+
+    def add_skill_cast_event(self, event):
+        return self.profiled_add_event(super().add_skill_cast_event, "add_skill_cast_event", event)
+
+
+def profiled_log_builder(input_lines, profiler, entities=None) -> LogStats:
+    """main_log_builder() through a ProfiledLogBuilder, recording the stages in the StageProfiler profiler.
+    Always in this process and without the event cache, so every line is read and parsed.
+    """
+    log_builder = ProfiledLogBuilder(profiler, entities=entities)
+    line_count = 0
+
+    with contextlib.ExitStack() as exit_stack:
+        if isinstance(input_lines, (str, os.PathLike)):
+            input_lines = exit_stack.enter_context(open(input_lines, 'r', encoding='utf-8'))
+        input_lines = iter(input_lines)
+
+        with profiler.stage("read + parse"):
+            while True:
+                perf_counter_start = time.perf_counter()
+                lines = tuple(itertools.islice(input_lines, 65536))
+                profiler.add_time("read", time.perf_counter() - perf_counter_start, len(lines))
+                if len(lines) == 0:
+                    break
+                log_builder.feed_lines(lines)
+                line_count += len(lines)
+        profiler.stages["read + parse"]["lines"] = line_count
+
+    with profiler.stage("build", line_count):
+        return log_builder.build()
+
+
+def generate_output(log_stats, perf_counter_start = 0, user_file = None,
+    custom_text_field = "undefined_custom_text_field", write_output = True, profiler = None):
+    """Generate output from a LogStats object. If user_file is not None, will copy it to output folder.
+    If profiler (a StageProfiler) is given, charts and writes are timed too and its results are included as Profile.json.
+    """
+
+    log_start = time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_start_time))
+    log_end = time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_end_time))
+
+    output_filenames = render_charts(log_stats, profiler=profiler)
+
+    for filename in ('Output.txt', SNAPSHOT_FILENAME, PROFILE_FILENAME):
+        try:
+            os.unlink(filename)
+        except(FileNotFoundError):
+            pass
+
+    if write_output:
+        with profiler_stage(profiler, "write snapshot"):
+            write_snapshot(log_stats, custom_text_field=custom_text_field) # before write_to_txt(), which adds "NO DATA" to empty dicts
+        output_filenames.append(SNAPSHOT_FILENAME)
+
+        with profiler_stage(profiler, "write Output.txt"):
+            write_to_txt(True, custom_message="Combat.log times (based on log's client's system time):\nSTART: %s | END: %s\n%s | (~%s seconds elapsed)" %
+                (time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_start_time)),
+                time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_end_time)),
+                custom_text_field, log_stats.log_elapsed_time))
+
+            if len(log_stats.langs_contained) > 1:
+                write_to_txt(True, custom_message="More than one language in combat.log! %s" % (log_stats.langs_contained))
+            else:
+                write_to_txt(True, custom_message='combat.log language is %s' % (log_stats.langs_contained))
+            write_to_txt(False, title='OUTGOING DMG', dict_container=log_stats.dmg_log)
+            write_to_txt(False, title='RECEIVED DMG', dict_container=log_stats.received_dmg_log)
+            write_to_txt(False, title='OUTGOING HEALING', dict_container=log_stats.heal_log)
+            write_to_txt(False, title='SELFHEALING', dict_container=log_stats.self_heal_log)
+            write_to_txt(False, title='SONG BUFF STATS', dict_container=log_stats.tracked_songs_total_buffs)
+            write_to_txt(False, title='SONG CHARM STATS', dict_container=log_stats.tracked_songs_total_debuffs)
+            write_to_txt(False, title='SKILLS USED BY PLAYER (experimental)', dict_container=log_stats.tracked_player_skills)
+            write_to_txt(False, title='PLAYERS THAT USED A SKILL (experimental)', dict_container=log_stats.tracked_skill_players)
         output_filenames.append('Output.txt')
 
+    if profiler is not None:
+        profiler.write()
+        output_filenames.append(PROFILE_FILENAME)
+
     if user_file == os.path.abspath('compiled_combat.log'): # this may cause issues
         output_filenames.append('compiled_combat.log')
 
@@ -211,6 +1101,158 @@ def generate_output(log_stats, perf_counter_start = 0, user_file = None,
     print("\nData generation done, returning.")
 
 
+CHART_WORKERS = min(5, os.cpu_count() or 1) # render_charts() makes 5 charts
+chart_executor = None # render_charts()'s pool, kept between calls so follow mode and batches start its processes once
+
+
+def shutdown_chart_executor():
+    """Stop render_charts()'s pool and its processes, the next call starts a new one. Also called at exit."""
+    global chart_executor
+    if chart_executor is not None:
+        chart_executor.shutdown()
+        chart_executor = None
+        atexit.unregister(shutdown_chart_executor)
+
+
+def render_charts(log_stats, profiler=None, parallel=True) -> "list[str]":
+    """Save the graphs of a LogStats object to the CWD, overwriting files with the same name. Returns the filenames saved.
+    If parallel, the charts are rendered at the same time by a pool of CHART_WORKERS processes, reused by the next calls
+    until shutdown_chart_executor(). Compare with archerageBench.py --charts on the machine used.
+    Each chart is timed as a stage of profiler if given, a StageProfiler (without peak memory if rendered in the pool).
+    """
+    global chart_executor
+
+    log_start = time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_start_time))
+    log_end = time.strftime(r"%d/%m/%y %H:%M:%S", time.localtime(log_stats.log_end_time))
+
+    output_filenames = []
+
+    dmg_log_simple = build_simple_dict(log_stats.dmg_log)
+    heal_log_simple = build_simple_dict(log_stats.heal_log)
+    received_dmg_log_simple = build_simple_dict(log_stats.received_dmg_log)
+    item_heal_log_simple = build_simple_dict(log_stats.self_heal_log)
+
+    # complex_song_plot() completes the song dicts, Output.txt relies on it: done here as it may run in another process
+    complete_song_totals(log_stats.tracked_songs_total_buffs, True)
+    complete_song_totals(log_stats.tracked_songs_total_debuffs, False)
+
+    charts = (("plot Outgoing Damage", len(dmg_log_simple), horizontal_bar_plot, (dmg_log_simple,),
+            {"title" : 'Outgoing Damage\n%s -- %s' % (log_start, log_end), "x_label" : 'Damage Given (no pve)', "color" : 'crimson', "filename" : 'Outgoing Damage.png'}),
+        ("plot Outgoing Healing", len(heal_log_simple), horizontal_bar_plot, (heal_log_simple,),
+            {"title" : 'Outgoing Healing\n%s -- %s' % (log_start, log_end), "x_label" : 'Healing Given', "color" : 'tab:green', "filename" : 'Outgoing Healing.png'}),
+        ("plot Received Damage", len(received_dmg_log_simple), stacked_horizontal_bar_plot, (received_dmg_log_simple, item_heal_log_simple),
+            {"title" : 'Received Damage & Self-Healing\n%s -- %s' % (log_start, log_end), "x_label" : 'Quantity', "filename" : 'Received Damage.png'}),
+        ("plot Song Buffs", len(log_stats.tracked_songs_total_buffs), complex_song_plot, (log_stats.tracked_songs_total_buffs, True),
+            {"title" : 'Time spent in songs (logged time = %s' % (log_stats.log_elapsed_time) + 's)\n%s -- %s' % (log_start, log_end),
+            "y_label" : 'Entity', "y_limit" : 20, "filename" : 'Song Buffs.png'}),
+        ("plot Song Charms", len(log_stats.tracked_songs_total_debuffs), complex_song_plot, (log_stats.tracked_songs_total_debuffs, False),
+            {"title" : 'Time spent charmed by songs (logged time = %s' % (log_stats.log_elapsed_time) + 's)\n%s -- %s' % (log_start, log_end),
+            "y_label" : 'Entity', "y_limit" : 20, "filename" : 'Song Charms.png'}))
+
+    with profiler_stage(profiler, "render charts"):
+        if parallel and CHART_WORKERS > 1:
+            if chart_executor is None:
+                chart_executor = ProcessPoolExecutor(CHART_WORKERS)
+                atexit.register(shutdown_chart_executor)
+            futures = [chart_executor.submit(render_chart, os.getcwd(), plot_function, args, kwargs)
+                for stage, lines, plot_function, args, kwargs in charts]
+            results = [future.result() for future in futures]
+            if profiler is not None: # timed in the workers, their memory isn't traced here
+                for (stage, lines, plot_function, args, kwargs), (filename, seconds) in zip(charts, results):
+                    profiler.add_time(stage, seconds, lines)
+        else:
+            results = []
+            for stage, lines, plot_function, args, kwargs in charts:
+                with profiler_stage(profiler, stage, lines):
+                    results.append(render_chart(os.getcwd(), plot_function, args, kwargs))
+
+    for filename, seconds in results:
+        if filename is not None:
+            output_filenames.append(filename)
+
+    return output_filenames
+
+
+def render_chart(cwd, plot_function, args, kwargs) -> "tuple[str | None, float]":
+    """Call a plot function saving its chart in the cwd folder, worker of render_charts().
+    Returns the filename saved relative to cwd (None if nothing was), and the seconds it took.
+    """
+    perf_counter_start = time.perf_counter()
+    filename = plot_function(*args, **dict(kwargs, filename=os.path.join(cwd, kwargs["filename"])))
+    seconds = time.perf_counter() - perf_counter_start
+    if filename is None:
+        return None, seconds
+    return os.path.relpath(filename, cwd), seconds
+
+
+def follow_log(combat_log, from_start=True, poll_interval=1, render_interval=10) -> LogBuilder:
+    """Follow a combat.log during combat with a LogFollower, re-rendering the graphs to the CWD at most every render_interval seconds.
+    Only new lines are read at each poll, every poll_interval seconds. Stops on KeyboardInterrupt (Ctrl+C),
+    returns the LogBuilder holding everything parsed.
+    """
+    log_follower = LogFollower(combat_log, from_start=from_start)
+    last_render = 0
+    lines_since_render = 0
+
+    print('Following "%s", graphs are updated in the CWD every %s seconds. Press Ctrl+C to stop.' % (combat_log, render_interval))
+    try:
+        while True:
+            lines_since_render += log_follower.poll()
+
+            if lines_since_render > 0 and time.monotonic() - last_render >= render_interval\
+            and log_follower.log_builder.first_timestamp is not None:
+                log_stats = log_follower.log_builder.build()
+                render_charts(log_stats)
+                print('%s | %s new lines | graphs updated' % (time.strftime(r"%H:%M:%S"), lines_since_render))
+                last_render = time.monotonic()
+                lines_since_render = 0
+
+            time.sleep(poll_interval)
+    except(KeyboardInterrupt):
+        print('Stopped following.')
+    finally:
+        shutdown_chart_executor()
+
+    return log_follower.log_builder
+
+
+def user_prompt_follow_log():
+    """While prompting user for options, follow a combat.log live with follow_log(). Generates the output once stopped."""
+    user_file = user_prompt_file()
+
+    if user_file is None:
+        return None
+
+    while True:
+        print('Include what the combat.log already contains? (N) to only use what is logged from now on.\n(Y) for Yes, (N) for No.')
+        user_input = input().lower()
+        if user_input == 'y':
+            print('Picked Yes.')
+            from_start = True
+            break
+        elif user_input == 'n':
+            print('Picked No.')
+            from_start = False
+            break
+        else:
+            print('Unknown command, looping')
+
+    print('Please indicate custom text to add to the final output.txt')
+    custom_text_field = input()
+
+    perf_counter_start = time.perf_counter()
+    try:
+        log_builder = follow_log(user_file, from_start=from_start)
+        log_stats = log_builder.build()
+    except:
+        recoverable_error_print()
+        return None
+
+    generate_output(log_stats, perf_counter_start=perf_counter_start, custom_text_field=custom_text_field)
+
+    user_prompt_dynamic_create_plot(log_stats)
+
+
 def user_prompt_main():
     """Introduce user to archeragestats.py and ask for input, looping."""
 
@@ -218,7 +1260,8 @@ def user_prompt_main():
 You may pick to parse a combat.log, or regenerate data from an output.txt made by this program in the past.
 Any generated files will be included in the directory where this program is located.""")
     while True:
-        print('\nType (1) to generate from a combat.log, (2) to regenerate from an output.txt, or (Q) to quit.')
+        print('\nType (1) to generate from a combat.log, (2) to regenerate from an output.txt,'
+            ' (3) to follow a combat.log live during combat, or (Q) to quit.')
         user_input = input().lower()
         if user_input == "q":
             print("Quitting\n")
@@ -234,6 +1277,11 @@ Any generated files will be included in the directory where this program is loca
             
             user_prompt_regenerate_logstats()
 
+        elif user_input == "3":
+            print("Picked live combat.log following.\n")
+
+            user_prompt_follow_log()
+
         else:
             print("Unknown command, looping")
             continue
@@ -263,7 +1311,7 @@ def user_prompt_log_builder():
 
     perf_counter_start = time.perf_counter()
     try:
-        log_stats = main_log_builder(user_file_chosen)
+        log_stats = main_log_builder(user_file_chosen, workers=os.cpu_count() or 1)
     except:
         recoverable_error_print()
         return None
@@ -277,436 +1325,725 @@ def user_prompt_log_builder():
     user_prompt_dynamic_create_plot(log_stats)
 
 
-def main_log_builder(input_lines) -> LogStats:
-    """Accepts a list of lines or a combat.log system path. Returns a filled LogStats object.
+def expand_combat_log_paths(patterns, root='') -> "list[str]":
+    """Returns the absolute paths of the files matched by patterns, in order and without duplicates.
+    A pattern is a file, a directory (all its .log files, recursively) or a glob pattern. Relative patterns are relative to root.
     """
-    if isinstance(input_lines, list):
-        pass
-    else:
-        with open(input_lines, 'r', encoding='utf-8') as f:
-            input_lines = f.readlines()
-
-    # combat.log timestamps are in MM/DD/YY client's system time
-    log_start_time = 0
-    log_end_time = 0
-    i_start, i_end = find_combat_log_lines_indexes(input_lines)
-    log_start_time = int(time.mktime(time.strptime(input_lines[i_start][1:18],'%m/%d/%y %H:%M:%S')))
-    log_end_time = int(time.mktime(time.strptime(input_lines[i_end][1:18],'%m/%d/%y %H:%M:%S')))
-
-    if log_start_time > log_end_time:
-        raise ValueError("Combat.log's last line has a timestamp earlier than its first line. Is the file edited manually?\n start: %s | end: %s"
-            % (log_start_time, log_end_time))
-
-    # _event = list of lists e.g. dmg_event: [["player", "target", "method", "value", "lang"], [...], ...]
-    # the last index in any of the lists will always be the language used to obtain it.
-    dmg_event = [] # any damage event. 
-    heal_event = [] # any heal event
-    buff_debuff_event = [] # skill casts, BUFFS&DEBUFFS obtained&lost, skills successfully cast.
-    skill_cast_event = [] # |r successfully cast | events
-
-    lang_current = Locale()
-    lang_current_str = ""
-    langs_contained = set()
-    
-    def language_check(line):
-        """Checks the language of the provided string line. Edits parent variable to correct language.
-        """
-        nonlocal lang_current_str
-
-        EN_lang_regex = re.compile(r"^.+?\|r(?:\'s)? [a-z]")
-        RU_lang_regex = re.compile(r"^.+?\|r(?:\:)? [\u0400-\u04FF]")
-        if EN_lang_regex.match(line) is not None:
-            lang_current.EN()
-            langs_contained.add("EN")
-            if lang_current_str == "EN":
-                raise ValueError("Language changed despite not being required, infinite loop: %s" % (line))
-            lang_current_str = "EN"
-        elif RU_lang_regex.match(line) is not None:
-            lang_current.RU()
-            langs_contained.add("RU")
-            if lang_current_str == "RU":
-                raise ValueError("Language changed despite not being required, infinite loop: %s" % (line))
-            lang_current_str = "RU"
-
+    combat_logs = {}
+    for pattern in patterns:
+        pattern = os.path.join(root, pattern)
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(glob.escape(pattern), '**', '*.log'), recursive=True))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
         else:
-            raise ValueError("cannot find lang: " + line)
-
-    def sort_log_events_EN(line_EN):
-        """Checks a string line obtained from a combat.log. english locale.
-        parses it into an event list, directly appending parent's list.
-        """
-        if any(a in line_EN for a in lang_current.unwanted_events)\
-        or any(a in line_EN for a in lang_current.pve_bosses):
-            return None
+            matches = sorted(glob.glob(pattern, recursive=True))
+        for match in matches:
+            if os.path.isfile(match) and not match.endswith(('.cache', '.index', '.tmp')): # files this module writes next to combat.logs
+                combat_logs.setdefault(os.path.abspath(match))
+    return list(combat_logs)
 
-        if "|r's" in line_EN or "was struck by a" in line_EN or "gained the buff:" in line_EN:
-            buff_debuff_event_line = lang_current.buff_debuff_regex.findall(line_EN)[0] + ("EN",)
-            buff_debuff_event.append(buff_debuff_event_line)
-
-        elif "|r successfully cast |" in line_EN:
-            skill_cast_event_line = lang_current.skill_cast_regex.findall(line_EN)[0] + ("EN",)
-            skill_cast_event.append(skill_cast_event_line)
-        
-        elif "|r attacked " in line_EN and "|r using |" in line_EN:
-            dmg_event_line = lang_current.damage_regex.findall(line_EN)[0] + ("EN",)
-            dmg_event.append(dmg_event_line)
-
-        elif "|r targeted " in line_EN:
-            heal_event_line = lang_current.heal_regex.findall(line_EN)[0] + ("EN",)
-            if "orange goblet of honor" in heal_event_line[2]: # goblet can have many ranks appended
-                heal_event_line[2] = "orange goblet of honor"
-            heal_event.append(heal_event_line)
-
-        elif "|r attacked " in line_EN:
-            autoattack_event_line = lang_current.auto_attack_regex.findall(line_EN)[0] + ("EN",)
-            dmg_event.append(autoattack_event_line)
-        
-        else:
-            raise ValueError()
-    
-    def sort_log_events_RU(line_RU):
-        if any(a in line_RU for a in lang_current.unwanted_events)\
-        or any(a in line_RU for a in lang_current.pve_bosses)\
-        or lang_current.is_casting_regex.search(line_RU) is not None:
-            return None
-        
-        elif ": наложен" in line_RU or "эффект " in line_RU:
-            buff_debuff_event_line = lang_current.buff_debuff_regex.search(line_RU)
-            if "наложен" in buff_debuff_event_line.group(3):
-                identifier = "gained"
-            elif "эффект" in buff_debuff_event_line.group(3):
-                identifier = "s"
-
-            for index, method in enumerate(lang_current.all_songs["RU"]):
-                if method == buff_debuff_event_line.group(4):
-                    method = lang_current.all_songs["EN"][index]
-                    break
-            
-            buff_debuff_event_line = (buff_debuff_event_line.group(1), buff_debuff_event_line.group(2),
-                                    identifier, method, "RU")
-            buff_debuff_event.append(buff_debuff_event_line)
-
-        elif ": применено умение" in line_RU:
-            skill_cast_event_line = lang_current.skill_cast_regex.findall(line_RU)[0] + ("RU",)
-            skill_cast_event.append(skill_cast_event_line)
-
-        elif "снижается на" in line_RU and " атакует" not in line_RU\
-        or "блокирует " in line_RU and " атакует" not in line_RU\
-        or "парирует " in line_RU and " атакует" not in line_RU:
-            dmg_event_line = lang_current.damage_regex.search(line_RU)
-            dmg_event_line = (dmg_event_line.group(1), dmg_event_line.group(3),
-                            dmg_event_line.group(2), dmg_event_line.group(4), "RU")
-            dmg_event.append(dmg_event_line)
-
-        elif "восстанавливает " in line_RU:
-            heal_event_line = lang_current.heal_regex.search(line_RU)
-            if "orange goblet of honor" in heal_event_line.group(3): # goblet can have many ranks appended
-                heal_event_line[2] = "orange goblet of honor"
-            heal_event_line = (heal_event_line.group(1), heal_event_line.group(3),
-                            heal_event_line.group(2), heal_event_line.group(4), "RU")
-            heal_event.append(heal_event_line)
-
-        elif " атакует" in line_RU:
-            autoattack_event_line = lang_current.auto_attack_regex.findall(line_RU)[0] + ("RU",)
-            dmg_event.append(autoattack_event_line)
 
+def batch_log_builder(combat_log, use_cache=True, profile=False, export_events=False, entities=None) -> "tuple[LogStats | None, float, str | None, StageProfiler | None, tuple | None]":
+    """Worker of batch_main(). Returns the combat.log's LogStats, the seconds it took, None, its StageProfiler if profile
+    and its events (see combat_log_events()) if export_events, or None, 0, the traceback, None and None if it failed.
+    entities -- EntityRegistry, see main_log_builder()
+    """
+    perf_counter_start = time.perf_counter()
+    try:
+        profiler = StageProfiler() if profile else None
+        events = None
+        if export_events and not use_cache and profiler is None: # parsed once, recording the events without writing a cache
+            log_builder = LogBuilder(record_events=True, entities=entities)
+            with open(combat_log, 'r', encoding='utf-8') as f:
+                log_builder.feed_lines(f)
+            log_stats = log_builder.build()
+            events = ([log_builder.event_columns], event_cache_trailer(log_builder))
         else:
-            raise ValueError()
-
-    language_check(input_lines[i_start])
+            log_stats = main_log_builder(combat_log, use_cache=use_cache, profiler=profiler, entities=entities)
+            if export_events:
+                events = combat_log_events(combat_log, use_cache=use_cache)
+        return log_stats, time.perf_counter() - perf_counter_start, None, profiler, events
+    except:
+        return None, 0, traceback.format_exc(), None, None
+
+
+def batch_main(combat_logs, workers=None, custom_text_field="batch", copy_log=False, use_cache=True, profile=False, merge=False, sqlite_database=None, entities=None):
+    """Generate the output of every combat.log path given without prompting, each moved to its dated combatLogs folder.
+    combat.logs are parsed by batch_log_builder() in a pool of workers processes (default: CPU count) while this process
+    generates the outputs as they finish, one at a time as generate_output() works in the CWD. Prints files/sec and lines/sec at the end.
+    Each output's script time is its combat.log's parse plus its output, not counting the time it waited for a worker.
+    If profile, each output folder gets a Profile.json, see StageProfiler.
+    If merge, an output of every combat.log merged together is generated last, see merge_log_stats().
+    If sqlite_database is given, every combat.log's events are also exported to it, see export_to_sqlite(). They come from
+    the worker's parse, without parsing again or writing an event cache if not use_cache.
+    entities -- EntityRegistry given to the workers, see main_log_builder()
+    """
+    entities = EntityRegistry() if entities is None else entities # the lists as they are now, workers don't see later changes
+    print('Batch: %s combat.log files' % (len(combat_logs)))
+    perf_counter_start = time.perf_counter()
+    files_done = 0
+    lines_done = 0
+    failed = []
+    merge_parts = {} # {combat_log : LogStats}, copied before generate_output() completes them
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {executor.submit(batch_log_builder, combat_log, use_cache, profile, sqlite_database is not None, entities) : combat_log
+            for combat_log in combat_logs}
+        for future in as_completed(futures):
+            combat_log = futures[future]
+            log_stats, parse_time, error, profiler, events = future.result()
+            print('\n----- %s -----' % (combat_log))
+            if error is None:
+                try:
+                    if merge:
+                        merge_parts[combat_log] = LogStats().merge(log_stats)
+                    generate_output(log_stats, perf_counter_start=time.perf_counter() - parse_time,
+                        user_file=combat_log if copy_log else None, custom_text_field=custom_text_field, profiler=profiler)
+                    if sqlite_database is not None:
+                        export_to_sqlite(combat_log, sqlite_database, events=events)
+                except:
+                    error = traceback.format_exc()
+
+            if error is not None:
+                print(error)
+                failed.append(combat_log)
+                continue
+            files_done += 1
+            lines_done += log_stats.log_line_count
 
-    i = i_start
-    while i <= i_end:
+    if len(merge_parts) > 0:
+        print('\n----- merged: %s combat.log files -----' % (len(merge_parts)))
         try:
-            if lang_current_str == "EN":
-                sort_log_events_EN(input_lines[i])
-            elif lang_current_str == "RU":
-                sort_log_events_RU(input_lines[i])
-        
-        except(ValueError):
-            language_check(input_lines[i])
-        
-        else:
-            i += 1
+            merged = merge_log_stats(merge_parts[combat_log] for combat_log in combat_logs if combat_log in merge_parts)
+            generate_output(merged, perf_counter_start=time.perf_counter(), custom_text_field="%s | merged %s combat.logs" % (custom_text_field, len(merge_parts)))
+        except:
+            print(traceback.format_exc())
+            failed.append("merged output")
+
+    shutdown_chart_executor()
+    elapsed_time = time.perf_counter() - perf_counter_start
+    print('\nBatch done: %s files (%s failed) | %s lines | %.2f seconds | %.2f files/sec | %.0f lines/sec' %
+        (files_done, len(failed), lines_done, elapsed_time, files_done / elapsed_time, lines_done / elapsed_time))
+    for combat_log in failed:
+        print('FAILED: %s' % (combat_log))
+
+
+class Vocabulary():
+    """Strings interned to ints, names, skills and langs are stored once and events refer to them by index.
+    Can be shared by several EventColumns objects.
+    """
+    __slots__ = ("strings", "string_ids", "lowered_strings")
 
-    def sort_dmg_event(event_list) -> "tuple[dict, dict]":
-        """Sorts events as given by event_list, obtained from sort_log_events()'s dmg_event.
-        
-        Returns two sorted dictionaries: player and dmg total, player and dmg taken total.
-        Format {player : {total : int, ability1 : int, ability2 : int, ...}}
-        """
-        damage_dealt = {}
-        damage_received = {}
-        for event in event_list:
-            source = event[0]
-            target = event[1]
-            method = event[2].lower()
-            value = event[3]
-            
-            if " " in source:
-                continue
-            if " " in target:
-                continue
+    def __init__(self, strings=()):
+        self.strings = list(strings)
+        self.string_ids = {string : n for n, string in enumerate(self.strings)}
+        self.lowered_strings = []
 
-            damage_dealt.setdefault(source, {"total":0})
-            damage_dealt[source].setdefault(method, 0)
-            
-            damage_dealt[source]["total"] += int(value)
-            damage_dealt[source][method] += int(value)
+    def __len__(self):
+        return len(self.strings)
 
-            damage_received.setdefault(target, {"total":0})
-            damage_received[target].setdefault(method, 0)
-            
-            damage_received[target]["total"] += int(value)
-            damage_received[target][method] += int(value)
-        
-        damage_dealt = dict(sorted(damage_dealt.items(), key=lambda x: x[1]["total"], reverse=True))
-        damage_received = dict(sorted(damage_received.items(), key=lambda x: x[1]["total"], reverse=True))
-        
-        for k in damage_dealt:
-            damage_dealt[k] = dict(sorted(damage_dealt[k].items(), key=lambda x: x[1], reverse=True))
-        
-        for k in damage_received:
-            damage_received[k] = dict(sorted(damage_received[k].items(), key=lambda x: x[1], reverse=True))
+    def string_id(self, string) -> int:
+        """Return the index of string in strings, adding it if needed. None gives -1."""
+        if string is None:
+            return -1
+        try:
+            return self.string_ids[string]
+        except(KeyError):
+            self.strings.append(string)
+            self.string_ids[string] = len(self.strings) - 1
+            return len(self.strings) - 1
+
+    def lowered(self) -> list:
+        """Return strings lowercased, index for index. Each string is only lowercased once."""
+        for string in self.strings[len(self.lowered_strings):]:
+            self.lowered_strings.append(string.lower())
+        return self.lowered_strings
+
+
+class EventColumns():
+    """Events added to a LogBuilder, stored as int-coded columns (arrays) instead of tuples of strings. Event n is:
+    kind[n] -- 0 dmg, 1 heal, 2 buff/debuff, 3 skill cast
+    source[n], target[n], skill[n], lang[n] -- index in vocabulary, -1 if the event has none. skill is the song for buff/debuff events
+    value[n] -- dmg or heal value, index in IDENTIFIERS for buff/debuff events, 1 for skill casts
+    timestamp[n] -- time of the event's line in seconds since epoch
+    About 21 bytes per event, against over 100 for a tuple of interned strings and ints.
+    """
+    IDENTIFIERS = ("gained", "struck", "s")
+    IDENTIFIER_CODES = {identifier : n for n, identifier in enumerate(IDENTIFIERS)}
+    COLUMNS = (("kind", "b"), ("source", "i"), ("target", "i"), ("skill", "i"), ("value", "i"), ("timestamp", "q"), ("lang", "i"))
+    __slots__ = ("vocabulary",) + tuple(name for name, typecode in COLUMNS)
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array.array(typecode))
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, source, target, skill, value, timestamp, lang):
+        string_id = self.vocabulary.string_id
+        self.kind.append(kind)
+        self.source.append(string_id(source))
+        self.target.append(string_id(target))
+        self.skill.append(string_id(skill))
+        self.value.append(value)
+        self.timestamp.append(timestamp)
+        self.lang.append(string_id(lang))
+
+
+class EventCacheWriter():
+    """Writes a combat.log's event cache next to it, read by load_event_cache(). Format, integers are 8 bytes little endian:
+    EVENT_CACHE_MAGIC, then a length prefixed JSON header with the cache version, the combat.log's size and mtime and the locale grammars' hash,
+    then any amount of segments: a length prefixed JSON header (events, strings) followed by each of EventColumns' arrays,
+    then a length prefixed JSON trailer with the LogBuilder's remaining state. The file is only renamed to its final name once complete.
+    The cache is optional: if it can't be written (e.g. a read-only folder), it is discarded and every method does nothing.
+    """
+    def __init__(self, combat_log):
+        self.cache_file = event_cache_path(combat_log)
+        self.f = None
+        try:
+            self.f = open(self.cache_file + '.tmp', 'wb')
+            self.f.write(EVENT_CACHE_MAGIC)
+            self.write_json(combat_log_identity(combat_log, EVENT_CACHE_VERSION, grammars=True))
+        except(OSError):
+            self.discard()
+
+    def write_json(self, dictionary):
+        data = json.dumps(dictionary, ensure_ascii=False).encode('utf-8')
+        self.f.write(len(data).to_bytes(8, 'little'))
+        self.f.write(data)
+
+    def write_segment(self, event_columns):
+        """Write an EventColumns object, segments are replayed in the order written."""
+        if self.f is None:
+            return None
+        try:
+            self.write_json({"events" : len(event_columns), "strings" : event_columns.vocabulary.strings,
+                "columns" : [(name, typecode, getattr(event_columns, name).itemsize) for name, typecode in EventColumns.COLUMNS]})
+            for name, typecode in EventColumns.COLUMNS:
+                getattr(event_columns, name).tofile(self.f)
+        except(OSError):
+            self.discard()
+
+    def close(self, log_builder):
+        """Write the trailer with log_builder's state and move the cache to its final name."""
+        if self.f is None:
+            return None
+        try:
+            self.write_json(event_cache_trailer(log_builder))
+            self.f.close()
+            os.replace(self.cache_file + '.tmp', self.cache_file)
+        except(OSError):
+            self.discard()
+        self.f = None
+
+    def discard(self):
+        """Close and delete an incomplete cache."""
+        if self.f is None:
+            return None
+        try:
+            self.f.close()
+            os.unlink(self.cache_file + '.tmp')
+        except(OSError):
+            pass
+        self.f = None
 
-        return (damage_dealt, damage_received)
 
+EVENT_CACHE_MAGIC = b"archerageStats event cache\n"
+EVENT_CACHE_VERSION = 3
+EVENT_CACHE_SEGMENT_LINES = 1 << 20 # lines parsed per segment when writing a cache without parallel_log_builder()
 
-    def sort_heal_event(event_list) -> "tuple[dict, dict]": # for healing-related sources, especially to ensure healing and selfhealing is separated.
-        """Sorts events as given by event_list, obtained from sort_log_events()'s heal_event.
-        
-        Returns two sorted dictionaries: player and heal total, player and item/buffs self-healing total
-        (not self-targeting outgoing healing like vitalism, i.e rather healing pots, orange goblet, phoenix powerstone pet...).
-        Format {player : {total : int, ability1 : int, ability2 : int, ...}}
-        """
-        healing_dealt = {}
-        healing_self_items = {}
 
-        for event in event_list:
-            source = event[0]
-            target = event[1]
-            method = event[2].lower()
-            value = event[3]
-            lang = event[4]
+def event_cache_trailer(log_builder) -> dict:
+    """The state of a LogBuilder that its recorded events don't give back, the last part of an event cache."""
+    return {"events" : -1, "first_timestamp" : log_builder.first_timestamp, "last_timestamp" : log_builder.last_timestamp,
+        "langs_contained" : sorted(log_builder.langs_contained), "lang_current_str" : log_builder.lang_current_str,
+        "line_count" : log_builder.line_count}
 
-            if " " in source:
-                continue
-            if " " in target:
-                continue
 
-            if method in lang_current.all_heal_potions[lang]:
-                healing_self_items.setdefault(source, {"total" : 0})
-                healing_self_items[source].setdefault(method, 0)
+def event_cache_path(combat_log) -> str:
+    """Path of a combat.log's event cache."""
+    return os.fspath(combat_log) + '.cache'
 
-                healing_self_items[source]["total"] += int(value)
-                healing_self_items[source][method] += int(value)
-            
-            elif method not in lang_current.all_heal_pets[lang]: # normal heal
-                healing_dealt.setdefault(source, {"total" : 0})
-                healing_dealt[source].setdefault(method, 0)
-                
-                healing_dealt[source]["total"] += int(value)
-                healing_dealt[source][method] += int(value)
 
-            else: # healing pets
-                healing_self_items.setdefault(target, {"total" : 0})
-                healing_self_items[target].setdefault(method, 0)
+def combat_log_identity(combat_log, version, grammars=False) -> dict:
+    """What files made from a combat.log (event cache, timestamp index) are keyed by: their format version, the combat.log's size and last modification time.
+    If grammars, also locale_grammars_digest(), for files holding what the parse kept (event cache).
+    """
+    stat = os.stat(combat_log)
+    identity = {"version" : version, "size" : stat.st_size, "mtime_ns" : stat.st_mtime_ns}
+    if grammars:
+        identity["grammars"] = locale_grammars_digest()
+    return identity
 
-                healing_self_items[target]["total"] += int(value)
-                healing_self_items[target][method] += int(value)
 
-        healing_dealt = dict(sorted(healing_dealt.items(), key=lambda x: x[1]["total"], reverse=True))
-        healing_self_items = dict(sorted(healing_self_items.items(), key=lambda x: x[1]["total"], reverse=True))
+def locale_grammars_digest() -> str:
+    """Hash of every registered locale grammar, in the order registered. Changes whenever a locale is registered or edited."""
+    return hashlib.sha256(json.dumps(LOCALE_GRAMMARS, ensure_ascii=False).encode('utf-8')).hexdigest()
 
-        for k in healing_dealt:
-            healing_dealt[k] = dict(sorted(healing_dealt[k].items(), key=lambda x: x[1], reverse=True))
-        
-        for k in healing_self_items:
-            healing_self_items[k] = dict(sorted(healing_self_items[k].items(), key=lambda x: x[1], reverse=True))
-        
-        return (healing_dealt, healing_self_items)
 
-    def sort_buff_debuff_event(event_list) -> "tuple[dict, dict, int]":
-        """Sorts events as given by event_list, obtained from sort_log_events()'s buff_debuff_event.
-        
-        Returns two dictionaries in format {player : {song : timeinint, song1 : timeinint, ...}, ...}.
-        First dictionary tracks the buff versions of songs, second tracks the debuff versions.
-        Also returns combatlog elapsed time
-        """
-        timer = int(time.mktime(time.strptime(event_list[0][0],'%m/%d/%y %H:%M:%S')))
-        log_elapsed_time = 0
-        tracking_temporary = {} # {str Entity : {str Song: int Seconds, str Song: int Seconds, ...}}
-        tracked_songs_total_buffs = {} # ditto
-        tracked_songs_total_debuffs = {} # ditto
-        BUFFS = ('bulwark ballad (rank 2)', 'bloody chantey (rank 2)', 'quickstep (rank 5)') 
-        DEBUFFS = ('unguarded', 'lethargy (bloody chantey)', 'unpleasant sensation (quickstep)')
-
-        def tracked_songs_total_addition(entity, sub_dict_key, sub_dict_value):
-            if sub_dict_key in BUFFS:
-                dictionary_reference = tracked_songs_total_buffs
-            else:
-                dictionary_reference = tracked_songs_total_debuffs
-            
-            dictionary_reference.setdefault(entity, {})
+def read_event_cache(combat_log) -> "tuple[list[EventColumns], dict] | None":
+    """Returns the EventColumns segments of the combat.log's event cache, in order, and its trailer (see EventCacheWriter.close()).
+    Returns None if there is no cache or if it doesn't match the combat.log's current size and mtime or the registered locale grammars.
+    """
+    cache_file = event_cache_path(combat_log)
+    if not os.path.isfile(cache_file):
+        return None
 
-            if sub_dict_key in dictionary_reference[entity]:
-                dictionary_reference[entity][sub_dict_key] += sub_dict_value
-            else:
-                dictionary_reference[entity].update({sub_dict_key: sub_dict_value})
+    def read_json(f):
+        return json.loads(f.read(int.from_bytes(f.read(8), 'little')).decode('utf-8'))
 
-        for event in event_list:
-            entity = event[1]
+    segments = []
+    with open(cache_file, 'rb') as f:
+        if f.read(len(EVENT_CACHE_MAGIC)) != EVENT_CACHE_MAGIC or read_json(f) != combat_log_identity(combat_log, EVENT_CACHE_VERSION, grammars=True):
+            return None
 
-            if " " in entity:
+        while True:
+            segment = read_json(f)
+            if segment["events"] == -1: # trailer
+                return segments, segment
+
+            event_columns = EventColumns(Vocabulary(segment["strings"]))
+            for name, typecode, itemsize in segment["columns"]:
+                column = getattr(event_columns, name)
+                if column.typecode != typecode or column.itemsize != itemsize:
+                    return None
+                column.fromfile(f, segment["events"])
+            segments.append(event_columns)
+
+
+def load_event_cache(combat_log, group_by="dict", entities=None) -> "LogBuilder | None":
+    """Returns a LogBuilder filled from the combat.log's event cache, no line is parsed.
+    Returns None if there is no cache or if it doesn't match the combat.log's current size and mtime or the registered locale grammars.
+    group_by -- "dict" or "numpy", see LogBuilder.feed_event_columns()
+    entities -- EntityRegistry the events are filtered with, see LogBuilder.__init__
+    """
+    event_cache = read_event_cache(combat_log)
+    if event_cache is None:
+        return None
+    segments, trailer = event_cache
+
+    log_builder = LogBuilder(entities=entities)
+    for event_columns in segments:
+        log_builder.feed_event_columns(event_columns, group_by=group_by)
+
+    log_builder.first_timestamp = trailer["first_timestamp"]
+    log_builder.last_timestamp = trailer["last_timestamp"]
+    log_builder.langs_contained = set(trailer["langs_contained"])
+    log_builder.line_count = trailer["line_count"]
+    if trailer["lang_current_str"] != "":
+        log_builder.lang_current.use(trailer["lang_current_str"])
+        log_builder.lang_current_str = trailer["lang_current_str"]
+    return log_builder
+
+
+class EventIndex():
+    """Every event of a combat.log in time order, with inverted indexes from sources, targets and skills to the positions
+    of their events, for questions the aggregates of LogStats can't answer without parsing again. e.g. the dmg per skill
+    of Player1 on Player2 between two times: event_index.totals("skill", kind="dmg", source="Player1", target="Player2", start=t0, end=t1)
+    Names are case-sensitive, skills are lowercased like in LogStats. Times are seconds since epoch, see log_timestamp_to_epoch().
+    Unlike LogStats, nothing is filtered out: non-player names and every buff/debuff are kept.
+    Built by load_event_index(), or from any EventColumns objects such as a LogBuilder's event_columns when recording events.
+    """
+    KINDS = ("dmg", "heal", "buff_debuff", "skill_cast") # index is the kind in EventColumns
+
+    def __init__(self, segments):
+        """segments -- EventColumns objects, in the order of the combat.log. Events of a same second keep that order."""
+        merged = EventColumns()
+        vocabulary = merged.vocabulary
+        for event_columns in segments:
+            # ids of the segment's vocabulary in the merged one, skills lowercased. index -1 (no string) stays -1
+            string_ids = [vocabulary.string_id(string) for string in event_columns.vocabulary.strings] + [-1]
+            skill_ids = [vocabulary.string_id(string) for string in event_columns.vocabulary.lowered()] + [-1]
+            merged.kind.extend(event_columns.kind)
+            merged.source.extend([string_ids[n] for n in event_columns.source])
+            merged.target.extend([string_ids[n] for n in event_columns.target])
+            merged.skill.extend([skill_ids[n] for n in event_columns.skill])
+            merged.value.extend(event_columns.value)
+            merged.timestamp.extend(event_columns.timestamp)
+            merged.lang.extend([string_ids[n] for n in event_columns.lang])
+
+        order = sorted(range(len(merged)), key=merged.timestamp.__getitem__) # stable, timestamps aren't always in order
+        self.events = EventColumns(vocabulary)
+        for name, typecode in EventColumns.COLUMNS:
+            column = getattr(merged, name)
+            setattr(self.events, name, array.array(typecode, [column[n] for n in order]))
+
+        # {str : array of positions in events}, ascending
+        self.source_postings = self.build_postings(self.events.source)
+        self.target_postings = self.build_postings(self.events.target)
+        self.skill_postings = self.build_postings(self.events.skill)
+
+    def build_postings(self, column) -> dict:
+        postings = {}
+        for position, string_id in enumerate(column):
+            if string_id != -1:
+                postings.setdefault(string_id, array.array('i')).append(position)
+        return {self.events.vocabulary.strings[string_id] : positions for string_id, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.events)
+
+    def positions(self, kind=None, source=None, target=None, skill=None, start=None, end=None) -> "list[int]":
+        """Returns the positions in events of the events matching every filter given, in time order.
+        kind -- one of KINDS
+        source, target, skill -- a name, a lowercased skill
+        start, end -- seconds since epoch, both included
+        """
+        events = self.events
+        skill = None if skill is None else skill.lower()
+        first = 0 if start is None else bisect.bisect_left(events.timestamp, start)
+        last = len(events) if end is None else bisect.bisect_right(events.timestamp, end)
+
+        # the smallest posting list within the time range is walked, the other filters are checked on the columns
+        checks = []
+        candidates = range(first, last)
+        for postings, column, name in ((self.source_postings, events.source, source), (self.target_postings, events.target, target),
+            (self.skill_postings, events.skill, skill)):
+            if name is None:
                 continue
-            
-            identifier = event[2] # if 's', lost buff or debuff. if 'gained' or 'struck', gained buff or debuff.
-            song = event[3].lower()
+            if name not in postings:
+                return []
+            posting = postings[name]
+            posting_range = range(bisect.bisect_left(posting, first), bisect.bisect_left(posting, last))
+            if len(posting_range) < len(candidates):
+                candidates = posting[posting_range.start : posting_range.stop]
+            checks.append((column, events.vocabulary.string_ids[name]))
+        if kind is not None:
+            checks.append((events.kind, self.KINDS.index(kind)))
+
+        return [position for position in candidates if all(column[position] == value for column, value in checks)]
+
+    def events_matching(self, **filters) -> "list[tuple]":
+        """Returns the events matching filters (see positions()) in time order, as
+        (str kind, int time, str source, str target | None, str skill, int value, str lang | None) tuples.
+        value is the dmg or heal amount, the identifier ("gained", "struck" or "s") for buff/debuffs, 1 for skill casts.
+        """
+        events = self.events
+        strings = events.vocabulary.strings + [None] # index -1 gives None
+        return [(self.KINDS[events.kind[n]], events.timestamp[n], strings[events.source[n]], strings[events.target[n]],
+            strings[events.skill[n]], EventColumns.IDENTIFIERS[events.value[n]] if events.kind[n] == 2 else events.value[n],
+            strings[events.lang[n]]) for n in self.positions(**filters)]
+
+    def totals(self, group_by="source", **filters) -> dict:
+        """Returns {name : total} of the events matching filters (see positions()) per group_by ("source", "target" or "skill"),
+        sorted by total like LogStats' dicts. Totals add up dmg or heal amounts and count 1 per skill cast or buff/debuff,
+        give a kind filter not to mix them.
+        """
+        events = self.events
+        strings = events.vocabulary.strings + [None]
+        column = getattr(events, group_by)
+        totals = {}
+        for n in self.positions(**filters):
+            name = strings[column[n]]
+            totals[name] = totals.get(name, 0) + (events.value[n] if events.kind[n] in (0, 1) else 1)
+        return dict(sorted(totals.items(), key=lambda x: x[1], reverse=True))
+
+
+def combat_log_events(combat_log, use_cache=True) -> "tuple[list[EventColumns], dict]":
+    """Returns the events of a combat.log like read_event_cache(): EventColumns segments and a trailer (see event_cache_trailer()).
+    If use_cache, they are read from the combat.log's event cache when up to date. Otherwise the combat.log is parsed
+    in memory, and the cache written if use_cache and its folder allows it.
+    """
+    if use_cache:
+        event_cache = read_event_cache(combat_log)
+        if event_cache is not None:
+            return event_cache
 
-            if song not in (BUFFS + DEBUFFS):
-                continue
+    log_builder = LogBuilder(record_events=True)
+    with open(combat_log, 'r', encoding='utf-8') as f:
+        log_builder.feed_lines(f)
+    if use_cache:
+        event_cache_writer = EventCacheWriter(combat_log)
+        event_cache_writer.write_segment(log_builder.event_columns)
+        event_cache_writer.close(log_builder)
+    return [log_builder.event_columns], event_cache_trailer(log_builder)
+
+
+def load_event_index(combat_log) -> EventIndex:
+    """Returns an EventIndex of a combat.log, built from its events, see combat_log_events()."""
+    return EventIndex(combat_log_events(combat_log)[0])
+
+
+SQLITE_DATABASE = 'archerageStats.sqlite3'
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (id INTEGER PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+    first_timestamp TEXT NOT NULL, last_timestamp TEXT NOT NULL, langs TEXT NOT NULL, events INTEGER NOT NULL,
+    UNIQUE (size, mtime_ns, first_timestamp));
+CREATE TABLE IF NOT EXISTS kinds (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS entities (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS skills (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS events (log_id INTEGER NOT NULL REFERENCES logs (id), time INTEGER NOT NULL,
+    kind_id INTEGER NOT NULL REFERENCES kinds (id), source_id INTEGER NOT NULL REFERENCES entities (id),
+    target_id INTEGER REFERENCES entities (id), skill_id INTEGER NOT NULL REFERENCES skills (id), value INTEGER NOT NULL, lang TEXT);
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+CREATE INDEX IF NOT EXISTS events_source ON events (source_id);
+CREATE INDEX IF NOT EXISTS events_target ON events (target_id);
+CREATE INDEX IF NOT EXISTS events_skill ON events (skill_id);
+CREATE VIEW IF NOT EXISTS named_events AS SELECT events.log_id, events.time, kinds.name AS kind, source.name AS source,
+    target.name AS target, skills.name AS skill, events.value, events.lang FROM events JOIN kinds ON kinds.id = events.kind_id
+    JOIN entities AS source ON source.id = events.source_id LEFT JOIN entities AS target ON target.id = events.target_id
+    JOIN skills ON skills.id = events.skill_id;
+"""
 
-            event_time = int(time.mktime(time.strptime(event[0],'%m/%d/%y %H:%M:%S')))
 
-            time_difference = event_time - timer
-            log_elapsed_time += time_difference
+def export_to_sqlite(combat_log, database=SQLITE_DATABASE, events=None) -> int:
+    """Adds every event of a combat.log to a SQLite database, created if needed, and returns the log's id.
+    events -- the combat.log's (segments, trailer) if already at hand, e.g. from a parse in another process, else combat_log_events()
+    Tables: logs, kinds, entities (every source and target name), skills (lowercased, songs included) and events, with indexes
+    on time, source, target and skill. The named_events view joins the names back, e.g. the dmg per skill of a player:
+    SELECT skill, SUM(value) FROM named_events WHERE kind = 'dmg' AND source = 'Player' GROUP BY skill
+    Like EventIndex, nothing is filtered out. Times are seconds since epoch, a buff/debuff's value is its index in EventColumns.IDENTIFIERS.
+    A combat.log already exported, same size, modification time and first timestamp even if moved, isn't added again: its id is returned.
+    Everything is inserted in one transaction, a failed export leaves the database as it was.
+    """
+    stat = os.stat(combat_log)
+    segments, trailer = combat_log_events(combat_log) if events is None else events
 
-            delete_queue = []
-            for k in tracking_temporary:
-                for s in tracking_temporary[k]:
-                    tracking_temporary[k][s] += time_difference
-                    if tracking_temporary[k][s] > 4: # songs cannot be over 5 seconds in length + handles mismatch
-                        tracking_temporary[k][s] = 5
-                        tracked_songs_total_addition(k, s, tracking_temporary[k][s])
-                        delete_queue.append([k,s])
-            for n in delete_queue:
-                k, s = n
-                del tracking_temporary[k][s]
+    connection = sqlite3.connect(database)
+    try:
+        with connection: # one transaction, committed on success
+            connection.executescript("BEGIN;" + SQLITE_SCHEMA)
+            connection.executemany("INSERT OR IGNORE INTO kinds (id, name) VALUES (?, ?)", enumerate(EventIndex.KINDS))
+            existing = connection.execute("SELECT id FROM logs WHERE size = ? AND mtime_ns = ? AND first_timestamp = ?",
+                (stat.st_size, stat.st_mtime_ns, trailer["first_timestamp"])).fetchone()
+            if existing is not None:
+                return existing[0]
+
+            log_id = connection.execute("INSERT INTO logs (path, size, mtime_ns, first_timestamp, last_timestamp, langs, events) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (os.path.abspath(combat_log), stat.st_size, stat.st_mtime_ns, trailer["first_timestamp"],
+                trailer["last_timestamp"], ",".join(trailer["langs_contained"]), sum(len(event_columns) for event_columns in segments))).lastrowid
+
+            def table_ids(table, names, used) -> list:
+                """ids in an entities or skills table of names, by index. Only the names at the used indexes are inserted if missing,
+                the others get None like index -1 (no string)
+                """
+                connection.executemany("INSERT OR IGNORE INTO %s (name) VALUES (?)" % (table), ((names[n],) for n in used if n != -1))
+                ids = dict(connection.execute("SELECT name, id FROM %s" % (table)))
+                return [ids.get(name) for name in names] + [None]
+
+            for event_columns in segments:
+                entity_ids = table_ids("entities", event_columns.vocabulary.strings, set(event_columns.source) | set(event_columns.target))
+                skill_ids = table_ids("skills", event_columns.vocabulary.lowered(), set(event_columns.skill))
+                strings = event_columns.vocabulary.strings + [None]
+                connection.executemany("INSERT INTO events (log_id, time, kind_id, source_id, target_id, skill_id, value, lang) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ((log_id, timestamp, kind, entity_ids[source], entity_ids[target], skill_ids[skill], value,
+                    strings[lang]) for kind, source, target, skill, value, timestamp, lang in zip(*(getattr(event_columns, name)
+                    for name, typecode in EventColumns.COLUMNS))))
+            return log_id
+    finally:
+        connection.close()
+
+
+def main_log_builder(input_lines, workers=1, use_cache=True, profiler=None, group_by="dict", entities=None) -> LogStats:
+    """Accepts an iterable of lines (e.g. a list) or a combat.log system path. Returns a filled LogStats object.
+    A combat.log path is streamed line by line through a LogBuilder, the file is never fully loaded in memory.
+    If workers is above 1, a combat.log path is parsed by that many processes with parallel_log_builder().
+    If use_cache, a combat.log path is built from its event cache when up to date (see load_event_cache()),
+    else the cache is written while parsing, if its folder allows it. group_by is how the cache's events are aggregated, see LogBuilder.feed_event_columns().
+    If profiler (a StageProfiler) is given, the stages are recorded in it by profiled_log_builder(), workers and use_cache are ignored.
+    entities -- EntityRegistry telling players from NPCs (see LogBuilder.__init__), one with PLAYER_ALLOW_LIST and PLAYER_DENY_LIST
+    as they are now if None. Worker processes are given it, they don't see changes made to those lists at runtime.
+    """
+    entities = EntityRegistry() if entities is None else entities
+    if profiler is not None:
+        return profiled_log_builder(input_lines, profiler, entities=entities)
 
-            timer = event_time
+    if not isinstance(input_lines, (str, os.PathLike)):
+        log_builder = LogBuilder(entities=entities)
+        log_builder.feed_lines(input_lines)
+        return log_builder.build()
 
-            tracking_temporary.setdefault(entity, {})
+    if use_cache:
+        log_builder = load_event_cache(input_lines, group_by=group_by, entities=entities)
+        if log_builder is not None:
+            return log_builder.build()
 
-            if identifier == 'gained' or identifier == 'struck':
-                tracking_temporary[entity].update({song: 0})
+    if workers > 1:
+        return parallel_log_builder(input_lines, workers=workers, write_cache=use_cache, entities=entities)
 
-            elif identifier == 's':
-                try:
-                    tracked_songs_total_addition(entity, song, tracking_temporary[entity][song])
-                    del tracking_temporary[entity][song]
-                except(KeyError): # if mismatch occurs: de/buff loss event without ever acquiring it
-                    pass
-
-        def add_time_total(dictionary_reference):
-            for k in dictionary_reference: 
-                entity_total_song_time = 0
-                for s in dictionary_reference[k]:
-                    entity_total_song_time += dictionary_reference[k][s]
-                dictionary_reference[k].update({'time_total' : entity_total_song_time})
-
-        add_time_total(tracked_songs_total_buffs)
-        add_time_total(tracked_songs_total_debuffs)
-
-        tracked_songs_total_buffs = dict(sorted(tracked_songs_total_buffs.items(), key=lambda x: x[1]['time_total'], reverse=True))
-        tracked_songs_total_debuffs = dict(sorted(tracked_songs_total_debuffs.items(), key=lambda x: x[1]['time_total'], reverse=True))
-        
-        for k in tracked_songs_total_buffs:
-            del tracked_songs_total_buffs[k]['time_total']
-        for k in tracked_songs_total_debuffs:
-            del tracked_songs_total_debuffs[k]['time_total']
-        
-        return tracked_songs_total_buffs, tracked_songs_total_debuffs, log_elapsed_time
+    log_builder = LogBuilder(record_events=use_cache, entities=entities)
+    event_cache_writer = EventCacheWriter(input_lines) if use_cache else None
+    try:
+        with open(input_lines, 'r', encoding='utf-8') as f:
+            if event_cache_writer is None:
+                log_builder.feed_lines(f)
+            else:
+                while True: # a segment at a time, not keeping every event
+                    lines = tuple(itertools.islice(f, EVENT_CACHE_SEGMENT_LINES))
+                    if len(lines) == 0:
+                        break
+                    log_builder.feed_lines(lines)
+                    event_cache_writer.write_segment(log_builder.event_columns)
+                    log_builder.event_columns = EventColumns()
+                event_cache_writer.close(log_builder)
+    except:
+        if event_cache_writer is not None:
+            event_cache_writer.discard()
+        raise
+
+    return log_builder.build()
 
-    def sort_skill_cast_event(event_list) -> "tuple[dict, dict]":
-        """Return two sorted dicts. First is all skills used per player, second is all players that used a skill."""
-        player_skills = {}
-        skill_players = {}
-        
-        for event in event_list:
-            entity = event[0]
 
-            if " " in entity:
+def parallel_log_builder(combat_log, workers=None, chunk_size=16 * 1024 * 1024, write_cache=False, entities=None) -> LogStats:
+    """Like main_log_builder() with a combat.log system path, but the file is split into line-aligned chunks of about chunk_size bytes
+    parsed in parallel by build_log_chunk() in a pool of workers processes (default: CPU count), then merged in order.
+    Returns the same LogStats object as a serial parse. Files of a single chunk are parsed in this process.
+    If write_cache, the combat.log's event cache is written, a segment per chunk.
+    entities -- EntityRegistry given to every chunk's LogBuilder, see main_log_builder()
+    """
+    entities = EntityRegistry() if entities is None else entities
+    file_size = os.path.getsize(combat_log)
+    boundaries = [0]
+    with open(combat_log, 'rb') as f:
+        for n in range(chunk_size, file_size, chunk_size):
+            if n <= boundaries[-1]: # a line longer than chunk_size
                 continue
+            f.seek(n)
+            f.readline()
+            if f.tell() < file_size:
+                boundaries.append(f.tell())
+    boundaries.append(file_size)
+    chunks = tuple(zip(boundaries[:-1], boundaries[1:]))
 
-            skill = event[1].lower()
-            
-            player_skills.setdefault(entity, {})
-            skill_players.setdefault(skill, {})
+    if len(chunks) == 1:
+        return main_log_builder(combat_log, use_cache=write_cache, entities=entities)
 
-            player_skills[entity].setdefault(skill, 0)
-            skill_players[skill].setdefault(entity, 0)
+    event_cache_writer = EventCacheWriter(combat_log) if write_cache else None
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            results = executor.map(build_log_chunk, itertools.repeat(combat_log), *zip(*chunks), itertools.repeat(None), itertools.repeat(write_cache),
+                itertools.repeat(entities))
+            log_builder = LogBuilder(entities=entities)
+
+            for (start, end), (chunk_builder, first_line, first_lang) in zip(chunks, results):
+                # a chunk's language is detected on its first line, but a serial parse only switches language
+                # if the language in use can't parse the line: parse the chunk again if it would have been kept
+                previous_lang = log_builder.lang_current_str
+                if first_line is not None and previous_lang not in ("", first_lang)\
+                and log_builder.lang_current.line_classifier.classify(first_line) is not None:
+                    chunk_builder = build_log_chunk(combat_log, start, end, lang=previous_lang, record_events=write_cache, entities=entities)[0]
+
+                if event_cache_writer is not None:
+                    event_cache_writer.write_segment(chunk_builder.event_columns)
+                log_builder.merge(chunk_builder)
+
+        if event_cache_writer is not None:
+            event_cache_writer.close(log_builder)
+    except:
+        if event_cache_writer is not None:
+            event_cache_writer.discard()
+        raise
 
-            player_skills[entity][skill] += 1
-            skill_players[skill][entity] += 1
+    return log_builder.build()
 
-        player_skills = dict(sorted(player_skills.items(), key=lambda x: x[0]))
-        skill_players = dict(sorted(skill_players.items(), key=lambda x: x[0]))
-            
-        for k in player_skills:
-            player_skills[k] = dict(sorted(player_skills[k].items(), key=lambda x: x[1], reverse=True))
-        
-        for k in skill_players:
-            skill_players[k] = dict(sorted(skill_players[k].items(), key=lambda x: x[1], reverse=True))
-        
-        return player_skills, skill_players
 
-    log_stats = LogStats()
+def build_log_chunk(combat_log, start, end, lang=None, record_events=False, entities=None) -> "tuple[LogBuilder, str | None, str]":
+    """Parse bytes start to end of a combat.log, both at the start of a line, into a LogBuilder deferring its songs.
+    lang, record_events and entities are passed to LogBuilder. Returns the LogBuilder, the first combat.log line of the chunk (None if none)
+    and the language it was parsed with. Worker of parallel_log_builder().
+    """
+    with open(combat_log, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+
+    log_builder = LogBuilder(defer_songs=True, lang=lang, record_events=record_events, entities=entities)
+    lines = io.TextIOWrapper(io.BytesIO(chunk), encoding='utf-8') # same newline handling as open()
+    first_line = None
+    first_lang = log_builder.lang_current_str
+    for line in lines:
+        log_builder.feed_line(line)
+        if log_builder.first_timestamp is not None:
+            first_line = line
+            first_lang = log_builder.lang_current_str
+            break
+    log_builder.feed_lines(lines)
 
-    log_stats.dmg_log, log_stats.received_dmg_log = sort_dmg_event(dmg_event)
-    
-    log_stats.heal_log, log_stats.self_heal_log = sort_heal_event(heal_event)
+    return log_builder, first_line, first_lang
 
-    log_stats.tracked_songs_total_buffs, log_stats.tracked_songs_total_debuffs,\
-        log_stats.log_elapsed_time = sort_buff_debuff_event(buff_debuff_event)
 
-    log_stats.tracked_player_skills, log_stats.tracked_skill_players = sort_skill_cast_event(skill_cast_event)
+class LogFollower():
+    """Tails a combat.log that is still being written to, parsing only what was added since the last poll() into a LogBuilder.
+    Used by follow_log(). The byte offset of what was already parsed is kept in offset.
+    A line that can't be parsed is printed and skipped instead of ending the session, skipped_lines counts them.
+    """
+    def __init__(self, combat_log, from_start=True):
+        """from_start -- if False, what the combat.log already contains is skipped, only lines added afterwards are parsed"""
+        self.combat_log = combat_log
+        self.log_builder = LogBuilder()
+        self.offset = 0 if from_start else os.path.getsize(combat_log)
+        self.partial_line = b"" # a line still being written, completed by a later poll()
+        self.skipped_lines = 0
+
+    def poll(self) -> int:
+        """Parse the complete lines added to the combat.log since the last call. Returns the amount of lines parsed, skipped lines excluded.
+        If the combat.log got smaller (the game restarted a new one), it is followed again from its start with a new LogBuilder.
+        """
+        file_size = os.path.getsize(self.combat_log)
+        if file_size < self.offset:
+            self.log_builder = LogBuilder()
+            self.offset = 0
+            self.partial_line = b""
+
+        if file_size == self.offset:
+            return 0
+
+        with open(self.combat_log, 'rb') as f:
+            f.seek(self.offset)
+            added = f.read(file_size - self.offset)
+        self.offset += len(added)
+
+        complete, newline, self.partial_line = (self.partial_line + added).rpartition(b"\n")
+        lines_parsed = 0
+        for line in io.TextIOWrapper(io.BytesIO(complete + newline), encoding='utf-8'):
+            try:
+                self.log_builder.feed_line(line)
+            except(ValueError, AttributeError) as error: # no language can parse it, or its event regex found nothing
+                self.skipped_lines += 1
+                print('Skipped a line that could not be parsed (%s): %s' % (type(error).__name__, line.rstrip("\n")))
+                continue
+            lines_parsed += 1
 
-    log_stats.log_end_time = log_end_time
-    log_stats.log_start_time = log_start_time
-    log_stats.langs_contained = langs_contained
-    
-    return log_stats
+        return lines_parsed
 
 
 def user_prompt_regenerate_logstats():
-    """Prompts user for an output.txt file to regenerate LogStats with, using regenerate_logstats()"""
+    """Prompts user for a snapshot or an output.txt file to regenerate LogStats with, using regenerate_logstats_file()"""
 
-    print("Pick a valid output.txt to regenerate graphs & dictionary data with")
-    user_file = user_prompt_file()
+    print("Pick a valid %s or output.txt to regenerate graphs & dictionary data with" % (SNAPSHOT_FILENAME))
+    user_file = user_prompt_file(allowed_ext=('.json', '.txt'))
 
     if user_file is None:
         return None
     
-    with open(user_file, 'r', encoding='utf-8') as f:
-        input_lines = f.readlines()
-    
     print("Generate output? Skip if you only want the dynamic plots.\n(Y) for Yes, or (N) for No.")
     while True:
         user_input = input().lower()
         if user_input == "y":
             print("Picked Yes.")
-            copy_user_file = user_prompt_copy_log("output.txt")
-            if not copy_user_file:
-                user_file = None
+            copy_user_file = user_prompt_copy_log(os.path.basename(user_file))
+            copy_target = user_file if copy_user_file else None
 
             print('Please indicate custom text to add to the final output.txt')
             custom_text_field = input()
             
             perf_counter_start = time.perf_counter()
             try:
-                log_stats = regenerate_logstats(input_lines)
+                log_stats = regenerate_logstats_file(user_file)
             except:
                 recoverable_error_print()
                 return None
             
             generate_output(log_stats, perf_counter_start=perf_counter_start, write_output=False,
-                user_file=user_file, custom_text_field=custom_text_field)
+                user_file=copy_target, custom_text_field=custom_text_field)
            
             break
         elif user_input == "n" or user_input == "q":
             print("Picked No.")
             try:
-                log_stats = regenerate_logstats(input_lines)
+                log_stats = regenerate_logstats_file(user_file)
             except:
                 recoverable_error_print()
                 return None
@@ -717,8 +2054,107 @@ def user_prompt_regenerate_logstats():
     user_prompt_dynamic_create_plot(log_stats)
 
 
+def regenerate_logstats_file(user_file) -> LogStats:
+    """Regenerate a LogStats object from a snapshot or an output.txt file path.
+    An output.txt with a snapshot next to it, as in the folders made by generate_output(), is regenerated from the snapshot.
+    Older output.txt files without one go through regenerate_logstats().
+    """
+    if not user_file.lower().endswith('.json'):
+        snapshot_file = os.path.join(os.path.dirname(user_file), SNAPSHOT_FILENAME)
+        if not os.path.isfile(snapshot_file):
+            with open(user_file, 'r', encoding='utf-8') as f:
+                return regenerate_logstats(f.readlines())
+        print('Found %s next to the output.txt, using it instead.' % (SNAPSHOT_FILENAME))
+        user_file = snapshot_file
+
+    return load_snapshot(user_file)
+
+
+SNAPSHOT_FILENAME = 'Snapshot.json'
+SNAPSHOT_FORMAT = 'archerageStats snapshot'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DICTS = LogStats.DICT_NAMES
+
+
+def write_snapshot(log_stats, filename=SNAPSHOT_FILENAME, custom_text_field=''):
+    """Writes all of a LogStats object to a JSON file, read back as is by load_snapshot(). Dicts keep their order.
+    Overwrites filename, which must be a relative path.
+    """
+    if os.path.isabs(filename):
+        raise ValueError('Argument "filename" is an absolute path')
+
+    snapshot = {"format" : SNAPSHOT_FORMAT, "version" : SNAPSHOT_VERSION, "custom_text_field" : custom_text_field,
+        "log_start_time" : log_stats.log_start_time, "log_end_time" : log_stats.log_end_time,
+        "log_elapsed_time" : log_stats.log_elapsed_time, "langs_contained" : sorted(log_stats.langs_contained)}
+    for name in SNAPSHOT_DICTS:
+        snapshot[name] = getattr(log_stats, name)
+
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_snapshot(snapshot_file) -> LogStats:
+    """Returns the LogStats object saved by write_snapshot(). Raises ValueError if the file isn't a snapshot of a known version."""
+    with open(snapshot_file, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError('%s is not a snapshot' % (snapshot_file))
+    if snapshot["version"] > SNAPSHOT_VERSION:
+        raise ValueError('%s is a snapshot version %s, the newest supported is %s' % (snapshot_file, snapshot["version"], SNAPSHOT_VERSION))
+
+    log_stats = LogStats()
+    log_stats.log_start_time = snapshot["log_start_time"]
+    log_stats.log_end_time = snapshot["log_end_time"]
+    log_stats.log_elapsed_time = snapshot["log_elapsed_time"]
+    log_stats.langs_contained = set(snapshot["langs_contained"])
+    for name in SNAPSHOT_DICTS:
+        setattr(log_stats, name, snapshot[name])
+
+    return log_stats
+
+
+def merge_log_stats(log_stats_list) -> LogStats:
+    """Returns a new LogStats of all those given merged in order (see LogStats.merge()), sorted once at the end.
+    The LogStats objects given are left as they are.
+    """
+    merged = LogStats()
+    for log_stats in log_stats_list:
+        merged.merge(log_stats)
+    merged.sort()
+    return merged
+
+
+def merge_snapshots(snapshot_files, workers=None) -> LogStats:
+    """Returns the LogStats of snapshots (see write_snapshot()) merged in the order given, e.g. a week of sessions,
+    or a running total's snapshot followed by a new session's. The files are split in runs of consecutive snapshots,
+    loaded and merged by merge_snapshot_run() in a pool of workers processes (default: CPU count).
+    The runs are then merged in order and sorted once, giving the same LogStats as merging one by one.
+    """
+    snapshot_files = list(snapshot_files)
+    workers = min(workers or os.cpu_count() or 1, len(snapshot_files))
+    if workers <= 1:
+        merged = merge_snapshot_run(snapshot_files)
+    else:
+        runs = [snapshot_files[n * len(snapshot_files) // workers : (n + 1) * len(snapshot_files) // workers] for n in range(workers)]
+        with ProcessPoolExecutor(workers) as executor:
+            merged = LogStats()
+            for run_log_stats in executor.map(merge_snapshot_run, runs):
+                merged.merge(run_log_stats)
+    merged.sort()
+    return merged
+
+
+def merge_snapshot_run(snapshot_files) -> LogStats:
+    """Load and merge snapshots in order, unsorted. Worker of merge_snapshots()."""
+    merged = LogStats()
+    for snapshot_file in snapshot_files:
+        merged.merge(load_snapshot(snapshot_file))
+    return merged
+
+
 def regenerate_logstats(lines) -> LogStats:
-    """Regenerate a LogStats object with an output.txt file"""
+    """Regenerate a LogStats object with an output.txt file's lines"""
     
     log_stats = LogStats()
     time_regex = re.compile(r"START: (\d{2}\/\d{2}\/\d{2} \d{2}:\d{2}:\d{2}) \| END: (\d{2}\/\d{2}\/\d{2} \d{2}:\d{2}:\d{2})")
@@ -760,6 +2196,9 @@ def regenerate_logstats(lines) -> LogStats:
             data_type = detect_dict_type(m)
             log_stats_attribute_current = data_types[data_type]
 
+        elif m.rstrip("\n") == "NO DATA : IN DICT": # written for an empty dict, see write_to_txt()
+            continue
+
         else:
             m = fix_dict_formatting(m)
             log_stats_attribute_current.update(m)
@@ -887,18 +2326,15 @@ def user_prompt_timeframe(file_dir) -> "list[str] | None":
 
 def user_prompt_log_timeframe(combat_log) -> "list[str] | None":
     """Turn a given path to a valid combat.log into a lines list within a certain timeframe given by input.
-    Returns that list. If user quits early, returns None.
+    Returns that list. If user quits early, returns None. Only the lines around the timeframe are read, see read_log_timeframe().
     """
-    with open(combat_log, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    first_timestamp, last_timestamp = combat_log_end_timestamps(combat_log) # the timestamp index is only needed once dates are picked
     # format: [12/31/99 19:09:57] len = 19
 
-    i_start, i_end = find_combat_log_lines_indexes(lines)
-    
-    start_timestamp = lines[i_start][4:7] + lines[i_start][1:4] + lines[i_start][7:18]
-    start_timestamp_epoch = int(time.mktime(time.strptime(start_timestamp, r'%d/%m/%y %H:%M:%S')))
-    end_timestamp = lines[i_end][4:7] + lines[i_end][1:4] + lines[i_end][7:18]
-    end_timestamp_epoch = int(time.mktime(time.strptime(end_timestamp, r'%d/%m/%y %H:%M:%S')))
+    start_timestamp = first_timestamp[3:6] + first_timestamp[0:3] + first_timestamp[6:17]
+    start_timestamp_epoch = log_timestamp_to_epoch(first_timestamp)
+    end_timestamp = last_timestamp[3:6] + last_timestamp[0:3] + last_timestamp[6:17]
+    end_timestamp_epoch = log_timestamp_to_epoch(last_timestamp)
 
     print('-----\nStart timestamp: %s\nEnd timestamp: %s\n-----\n(dd/mm/yy)' % (start_timestamp, end_timestamp))
 
@@ -932,20 +2368,7 @@ def user_prompt_log_timeframe(combat_log) -> "list[str] | None":
         else:
             return recursive_return
 
-    for n in range(i_end, i_start, -1):
-        if int(time.mktime(time.strptime(lines[n][1:18], r'%m/%d/%y %H:%M:%S'))) <= end_date:
-            end_index = n
-            break
-
-    for n in range(i_start, i_end):
-        if int(time.mktime(time.strptime(lines[n][1:18], r'%m/%d/%y %H:%M:%S'))) >= start_date:
-            start_index = n
-            break
-    
-    compiled_lines = []
-    compiled_lines.append(lines[0])
-    compiled_lines += lines[start_index : end_index + 1]
-    return compiled_lines
+    return read_log_timeframe(combat_log, start_date, end_date)
 
 
 def user_prompt_validate_date() -> "int|None":
@@ -1007,31 +2430,194 @@ Valid characters: - | _''')
     return time_test
 
 
+TIMESTAMP_INDEX_VERSION = 1
+TIMESTAMP_INDEX_BLOCK_SIZE = 64 * 1024
+
+
+def timestamp_index_path(combat_log) -> str:
+    """Path of a combat.log's timestamp index."""
+    return os.fspath(combat_log) + '.index'
+
+
+def build_timestamp_index(combat_log, block_size=TIMESTAMP_INDEX_BLOCK_SIZE) -> dict:
+    """Returns a sparse timestamp index of a combat.log, reading it once. The file is cut in blocks of about block_size bytes,
+    each starting at a combat line. For each block the index holds its byte offset and its lowest and highest timestamp
+    (seconds since epoch), as timestamps aren't always in order. Format:
+    {"version" : int, "size" : int, "mtime_ns" : int, "first_timestamp" : str, "last_timestamp" : str,
+    "offsets" : [int, ...], "min_times" : [int, ...], "max_times" : [int, ...]}
+    Raises IndexError if the file has no combat lines.
+    """
+    timestamp_index = combat_log_identity(combat_log, TIMESTAMP_INDEX_VERSION)
+    offsets = []
+    min_times = []
+    max_times = []
+    first_timestamp = last_timestamp = None
+
+    offset = 0
+    block_end = 0 # a new block starts at the first combat line from here
+    with open(combat_log, 'rb') as f:
+        for line in f:
+            if line[0:1] == b"[" and line[3:4] == b"/":
+                timestamp = line[1:18].decode('utf-8')
+                event_time = log_timestamp_to_epoch(timestamp)
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                last_timestamp = timestamp
+
+                if offset >= block_end:
+                    offsets.append(offset)
+                    min_times.append(event_time)
+                    max_times.append(event_time)
+                    block_end = offset + block_size
+                elif event_time < min_times[-1]:
+                    min_times[-1] = event_time
+                elif event_time > max_times[-1]:
+                    max_times[-1] = event_time
+
+            offset += len(line)
+
+    if first_timestamp is None:
+        raise IndexError("Could not find any lines that match format of a combat.log: %s" % (combat_log))
+
+    timestamp_index.update({"first_timestamp" : first_timestamp, "last_timestamp" : last_timestamp,
+        "offsets" : offsets, "min_times" : min_times, "max_times" : max_times})
+    return timestamp_index
+
+
+def load_timestamp_index(combat_log) -> dict:
+    """Returns the timestamp index saved next to a combat.log, see build_timestamp_index().
+    If there is none or it doesn't match the combat.log's current size and mtime, it is built and saved first.
+    Saving is optional: if it can't be written (e.g. a read-only folder), the index is only returned.
+    """
+    index_file = timestamp_index_path(combat_log)
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            timestamp_index = json.load(f)
+        if {key : timestamp_index.get(key) for key in ("version", "size", "mtime_ns")}\
+        == combat_log_identity(combat_log, TIMESTAMP_INDEX_VERSION):
+            return timestamp_index
+    except(FileNotFoundError, ValueError):
+        pass
+
+    timestamp_index = build_timestamp_index(combat_log)
+    try:
+        with open(index_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(timestamp_index, f, separators=(',', ':'))
+        os.replace(index_file + '.tmp', index_file)
+    except(OSError):
+        try:
+            os.unlink(index_file + '.tmp')
+        except(OSError):
+            pass
+    return timestamp_index
+
+
+def combat_log_end_timestamps(combat_log) -> "tuple[str, str]":
+    """Returns the timestamps of the first and last combat lines of a combat.log. The file is memory-mapped and scanned
+    as bytes, line by line from its start then from its end: only the lines before the first combat line and after the last one
+    are looked at and only the two timestamps are decoded, whatever the size of the file.
+    Raises IndexError if the file has no combat lines.
+    """
+    with open(combat_log, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: # can't be mapped
+            raise IndexError("Could not find any lines that match format of a combat.log: %s" % (combat_log))
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_log:
+            line_start = 0
+            while not is_combat_line_at(mapped_log, line_start):
+                line_start = mapped_log.find(b"\n", line_start) + 1
+                if line_start == 0: # no newline left
+                    raise IndexError("Could not find any lines that match format of a combat.log: %s" % (combat_log))
+            first_timestamp = mapped_log[line_start + 1 : line_start + 18].decode('utf-8')
+
+            line_end = len(mapped_log)
+            while True: # ends at the latest on the first combat line
+                line_start = mapped_log.rfind(b"\n", 0, line_end - 1) + 1 # line_end - 1 is the line's own newline
+                if is_combat_line_at(mapped_log, line_start):
+                    break
+                line_end = line_start
+            last_timestamp = mapped_log[line_start + 1 : line_start + 18].decode('utf-8')
+
+    return first_timestamp, last_timestamp
+
+
+def is_combat_line_at(data, line_start) -> bool:
+    """True if the line starting at index line_start of bytes-like data has a combat.log timestamp, like "[12/31/99 19:09:57]" """
+    return data[line_start : line_start + 1] == b"[" and data[line_start + 3 : line_start + 4] == b"/"
+
+
+def read_log_timeframe(combat_log, start_date, end_date, timestamp_index=None) -> "list[str]":
+    """Returns the first line of a combat.log followed by its lines from the first one at or after start_date
+    to the last one at or before end_date (seconds since epoch). The blocks holding them are found by binary search
+    in the combat.log's timestamp index (load_timestamp_index() if not given), and only those are read.
+    The blocks are searched as bytes, only timestamps and the lines returned are decoded.
+    """
+    if timestamp_index is None:
+        timestamp_index = load_timestamp_index(combat_log)
+    offsets = timestamp_index["offsets"]
+
+    # running max from the start and running min from the end are sorted, even if timestamps aren't
+    max_times_before = list(itertools.accumulate(timestamp_index["max_times"], max))
+    min_times_after = list(itertools.accumulate(reversed(timestamp_index["min_times"]), min))[::-1]
+    first_block = bisect.bisect_left(max_times_before, start_date)
+    last_block = bisect.bisect_right(min_times_after, end_date) - 1
+
+    with open(combat_log, 'rb') as f:
+        compiled_lines = [f.readline().decode('utf-8').replace('\r\n', '\n')]
+        if first_block > last_block:
+            return compiled_lines
+
+        read_end = offsets[last_block + 1] if last_block + 1 < len(offsets) else timestamp_index["size"]
+        f.seek(offsets[first_block])
+        blocks = f.read(read_end - offsets[first_block])
+
+    def line_time(line_start) -> "int | None":
+        if is_combat_line_at(blocks, line_start):
+            return log_timestamp_to_epoch(blocks[line_start + 1 : line_start + 18].decode('utf-8'))
+        return None
+
+    timeframe_start = 0 # start of the first line at or after start_date
+    while timeframe_start < len(blocks):
+        event_time = line_time(timeframe_start)
+        if event_time is not None and event_time >= start_date:
+            break
+        timeframe_start = blocks.find(b"\n", timeframe_start) + 1 or len(blocks)
+
+    timeframe_end = len(blocks) # end of the last line at or before end_date
+    while timeframe_end > timeframe_start:
+        line_start = blocks.rfind(b"\n", 0, timeframe_end - 1) + 1
+        event_time = line_time(line_start)
+        if event_time is not None and event_time <= end_date:
+            break
+        timeframe_end = line_start
+
+    compiled_lines += io.TextIOWrapper(io.BytesIO(blocks[timeframe_start : timeframe_end]), encoding='utf-8')
+    return compiled_lines
+
+
 def horizontal_bar_plot(container, title='unknowntitle', x_label='unknownlabel', y_limit=30, color='royalblue', filename='unknown.png') -> "str | None":
     """Create simple horizontal bar graphs. Excepted dictionary is a simple one, format {player : int, player : int, ...}.
     Will return filename that was saved to CWD, or None if container is empty.
     """
     BAR_HEIGHT = 0.8
     BAR_SEPARATION_MODIFIER = 0.4
-    fig, axis = plt.subplots()
-    y_tick_labels = []
-    y_tick_pos = []
 
     if len(container) == 0:
         return None
     if len(container) < y_limit:
         y_limit = len(container)
+
+    plt = load_pyplot()
+    fig, axis = plt.subplots()
+    keys = tuple(container.keys())
+    drawn = y_limit + 1 # the rows below y_limit are out of view, but the next one may touch the edge
     
-    y_pos = BAR_HEIGHT
-    for k in container:
-        axis.barh(y_pos, container[k], color=color)
-        y_pos += BAR_HEIGHT + BAR_SEPARATION_MODIFIER
+    y_pos = [BAR_HEIGHT + ((BAR_HEIGHT + BAR_SEPARATION_MODIFIER) * n) for n in range(len(keys[:drawn]))]
+    axis.barh(y_pos, [container[k] for k in keys[:drawn]], color=color)
+    include_hidden_bars(axis, [container[k] for k in keys[drawn:]])
     
-    for n in range(y_limit):
-        key = tuple(container.keys())[n]
-        key = truncate_string(key, 14)
-        y_tick_labels.append(key)
-        y_tick_pos.append(BAR_HEIGHT + ((BAR_HEIGHT + BAR_SEPARATION_MODIFIER) * n))
+    y_tick_labels = [truncate_string(key, 14) for key in keys[:y_limit]]
+    y_tick_pos = y_pos[:y_limit]
     
     y_tick_labels.append('')
     y_tick_pos.append(y_tick_pos[-1] + BAR_HEIGHT) # ghost tick
@@ -1047,7 +2633,7 @@ def horizontal_bar_plot(container, title='unknowntitle', x_label='unknownlabel',
     plt.grid(axis='x')
     axis.set_axisbelow(True)
     plt.savefig(filename)
-    plt.clf()
+    plt.close(fig)
     return filename
 
 
@@ -1058,30 +2644,24 @@ color1='royalblue', color2='tab:green', filename='Received Damage.png', dict1_na
     """
     BAR_HEIGHT = 0.8
     BAR_SEPARATION_MODIFIER = 0.4
-    y_tick_labels = []
-    y_tick_pos = []
-    fig, axis = plt.subplots()
 
     if len(dict1) == 0:
         return None
     elif len(dict1) < y_limit:
         y_limit = len(dict1)
     
-    dict2_copy = copy.deepcopy(dict2)
+    plt = load_pyplot()
+    fig, axis = plt.subplots()
+    keys = tuple(dict1.keys())
+    drawn = y_limit + 1 # see horizontal_bar_plot()
     
-    y_pos = BAR_HEIGHT
-    for k in dict1:
-        dict2_copy.setdefault(k, 0)
-        axis.barh(y_pos, dict1[k], color=color1, label='bar1')
-        axis.barh(y_pos, dict2_copy[k], color=color2, label='bar2', hatch='/' * 5)
-        y_pos += BAR_HEIGHT + BAR_SEPARATION_MODIFIER
-        
+    y_pos = [BAR_HEIGHT + ((BAR_HEIGHT + BAR_SEPARATION_MODIFIER) * n) for n in range(len(keys[:drawn]))]
+    axis.barh(y_pos, [dict1[k] for k in keys[:drawn]], color=color1, label='bar1')
+    axis.barh(y_pos, [dict2.get(k, 0) for k in keys[:drawn]], color=color2, label='bar2', hatch='/' * 5)
+    include_hidden_bars(axis, [dict1[k] for k in keys[drawn:]] + [dict2.get(k, 0) for k in keys[drawn:]])
 
-    for n in range(y_limit):
-        key = tuple(dict1.keys())[n]
-        key = truncate_string(key, 14)
-        y_tick_labels.append(key)
-        y_tick_pos.append(BAR_HEIGHT + ((BAR_HEIGHT + BAR_SEPARATION_MODIFIER) * n))
+    y_tick_labels = [truncate_string(key, 14) for key in keys[:y_limit]]
+    y_tick_pos = y_pos[:y_limit]
     
     y_tick_labels.append('')
     y_tick_pos.append(y_tick_pos[-1] + BAR_HEIGHT) # ghost tick
@@ -1100,7 +2680,7 @@ color1='royalblue', color2='tab:green', filename='Received Damage.png', dict1_na
     plt.grid(axis='x')
     axis.set_axisbelow(True)
     fig.savefig(filename)
-    plt.clf()
+    plt.close(fig)
 
     return filename
 
@@ -1109,12 +2689,6 @@ def complex_song_plot(container, buff_or_debuff:bool, title='unknowntitle', y_la
     """Create 'complex' songchart. Will return filename that was saved to CWD, or None if container is empty.
     buff_or_debuff == True for buff, False for debuff.
     """
-    def customSongSort(element):
-        scanned = element[0][0:3]
-        scan_dict = {'bul' : 0, 'blo' : 1, 'qui' : 2,
-                     'ung' : 3, 'let' : 4, 'unp' : 5} # shortening of song names, see BUFFS/DEBUFFS below
-        return scan_dict[scanned]
-
     BAR_HEIGHT = 1
     BAR_SEPARATION_MODIFIER = 0.7
     BUFFS = ('bulwark ballad (rank 2)', 'bloody chantey (rank 2)', 'quickstep (rank 5)')
@@ -1123,7 +2697,6 @@ def complex_song_plot(container, buff_or_debuff:bool, title='unknowntitle', y_la
     LEGEND_DEBUFFS = ("Unguarded (Bulwark Ballad)", "Lethargy (Bloody Chantey)", "Unpleasant Sensation (Quickstep)")
     COLOR_TABLE_BUFFS = ('royalblue', 'crimson', 'orange')
     COLOR_TABLE_DEBUFFS = ('#3a5cc3', '#b61233', '#cd8500')
-    fig, axis = plt.subplots()
     
     if len(container) == 0:
         return None
@@ -1139,24 +2712,24 @@ def complex_song_plot(container, buff_or_debuff:bool, title='unknowntitle', y_la
         color_buff_or_debuff = COLOR_TABLE_DEBUFFS
         legend_buff_or_debuff = LEGEND_DEBUFFS
 
-    y_pos = BAR_HEIGHT
-    for k in container:
-        for n in songs_buff_or_debuff:
-            container[k].setdefault(n, 0) # dicts are mutable! but this is ok side effect
-        container[k] = dict(sorted(tuple(container[k].items()), key=customSongSort)) 
-        color_num = 0
-        for s in container[k]:
-            axis.barh(y_pos, container[k][s], label=s, color=color_buff_or_debuff[color_num], height=BAR_HEIGHT)
-            color_num += 1
-            y_pos += BAR_HEIGHT
-        y_pos += BAR_SEPARATION_MODIFIER
+    complete_song_totals(container, buff_or_debuff) # every entity, not only the ones drawn: Output.txt is written from the same dicts
+
+    plt = load_pyplot()
+    fig, axis = plt.subplots()
+    keys = tuple(container.keys())
+    drawn = y_limit + 1 # see horizontal_bar_plot()
+
+    for color_num, s in enumerate(songs_buff_or_debuff): # one barh per song, each entity gets a bar of each song in this order
+        y_pos = [BAR_HEIGHT + ((BAR_HEIGHT * 3 + BAR_SEPARATION_MODIFIER) * n) + (BAR_HEIGHT * color_num) for n in range(len(keys[:drawn]))]
+        axis.barh(y_pos, [container[k][s] for k in keys[:drawn]], label=s, color=color_buff_or_debuff[color_num], height=BAR_HEIGHT)
+    include_hidden_bars(axis, [container[k][s] for k in keys[drawn:] for s in songs_buff_or_debuff])
 
     y_tick_pos = []
     y_tick_labels = []
     
     for n in range(y_limit):
         y_tick_pos.append((BAR_HEIGHT * 2) + ((BAR_HEIGHT * 3 + BAR_SEPARATION_MODIFIER) * n))
-        key = tuple(container.keys())[n]
+        key = keys[n]
         key = truncate_string(key, 14)
         y_tick_labels.append(key)
 
@@ -1175,12 +2748,59 @@ def complex_song_plot(container, buff_or_debuff:bool, title='unknowntitle', y_la
     axis.set_axisbelow(True)
     plt.gca().invert_yaxis()
     fig.savefig(filename)
-    fig.clear()
-    axis.clear()
+    plt.close(fig)
     
     return filename
 
 
+def complete_song_totals(container, buff_or_debuff:bool):
+    """Give every entity of a song totals dict ({entity : {song : int, ...}, ...}) all 3 buff or debuff songs, 0 if missing,
+    in the order of LogBuilder.BUFFS or DEBUFFS. Edits the dict, done for complex_song_plot().
+    """
+    def customSongSort(element):
+        scanned = element[0][0:3]
+        scan_dict = {'bul' : 0, 'blo' : 1, 'qui' : 2,
+                     'ung' : 3, 'let' : 4, 'unp' : 5} # shortening of song names, see BUFFS/DEBUFFS
+        return scan_dict[scanned]
+
+    songs_buff_or_debuff = LogBuilder.BUFFS if buff_or_debuff else LogBuilder.DEBUFFS
+    for k in container:
+        for n in songs_buff_or_debuff:
+            container[k].setdefault(n, 0) # dicts are mutable! but this is ok side effect
+        container[k] = dict(sorted(tuple(container[k].items()), key=customSongSort))
+
+
+def load_pyplot():
+    """Returns matplotlib.pyplot, imported on the first call: parsing alone never needs it and it is slow to import."""
+    global plt
+    if plt is None:
+        import matplotlib
+        matplotlib.use('Agg') # charts are only ever saved to files, no window is needed
+        import matplotlib.pyplot
+        plt = matplotlib.pyplot
+    return plt
+
+
+def load_numpy():
+    """Returns numpy, imported on the first call. Only LogBuilder.feed_event_columns_numpy() needs it, it is an optional dependency."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except(ImportError):
+            raise ImportError("The numpy group-by needs numpy: pip install numpy") from None
+        np = numpy
+    return np
+
+
+def include_hidden_bars(axis, widths):
+    """Extend the x data limits of axis to horizontal bars of the given widths that weren't drawn,
+    so the x axis scales as if every bar was drawn, see horizontal_bar_plot().
+    """
+    if len(widths) > 0:
+        axis.update_datalim(((min(min(widths), 0), 0), (max(max(widths), 0), 0)))
+
+
 def move_to_folder(files_to_move: list, folder: str) -> "str | None":
     """Move list of files in first argument to folder in second argument, both always relative to CWD
     
@@ -1220,13 +2840,14 @@ def move_to_folder(files_to_move: list, folder: str) -> "str | None":
     return str(n)
 
 
-def user_prompt_file() -> "str | None":
-    """Prompts user for file to use.
+def user_prompt_file(allowed_ext=('.log', '.txt')) -> "str | None":
+    """Prompts user for file to use, of one of the allowed_ext extensions.
     
     Returns the absolute directory of the location of the prompted combat.log. If nothing picked, return None.
     """
+    from tkinter import filedialog # only needed by the prompts
+
     print('Pick a valid file.')
-    allowed_ext = ('.log', '.txt')
     user_file = filedialog.askopenfilename(filetypes = [('Plaintext file', allowed_ext)])
     
     if user_file == "":
@@ -1306,6 +2927,14 @@ def build_simple_dict(dictionary):
     return dictionary_simple
 
 
+@functools.lru_cache(maxsize=86400)
+def log_timestamp_to_epoch(timestamp:str) -> int:
+    """Convert a combat.log timestamp, "MM/DD/YY HH:MM:SS" in the log's client's system time, to seconds since epoch.
+    Memoized: most lines share their second with the lines around them, each distinct second is only parsed once.
+    """
+    return int(time.mktime(time.strptime(timestamp, '%m/%d/%y %H:%M:%S')))
+
+
 def fix_dict_formatting(line) -> dict:
     """Fix formatting of dicts directly written as strings.
     Currently loses double quotes inside keys or values, writing them as '' """
@@ -1370,36 +2999,50 @@ def recoverable_error_print():
     print("\nScript recovered from error\n")
 
 
-def find_combat_log_lines_indexes(lines:"list[str]") -> "tuple[int, int]":
-    """Returns the indexes of where the combat.log starts in the given array and where it ends."""
+def main(argv=None, launch_dir=None):
+    """Program entry point. With combat.log paths in argv (default: the command line), processes them with batch_main(),
+    else starts the interactive prompts. Either way, outputs are written to the current directory, the script's folder
+    when run as a script. launch_dir -- directory command line paths are relative to, the current directory if None
+    """
+    if launch_dir is None:
+        launch_dir = os.getcwd()
+
+    parser = argparse.ArgumentParser(description="Generate graphs and an output.txt from ArcheRage combat.log files. "
+        "Without any path, starts the interactive prompts.")
+    parser.add_argument('paths', nargs='*', help="combat.log files, directories (all .log files inside) or glob patterns, processed without prompts")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="processes parsing combat.logs (default: CPU count)")
+    parser.add_argument('-t', '--text', default="batch", help="custom text added to each output.txt")
+    parser.add_argument('--copy-log', action='store_true', help="copy each combat.log to its output folder")
+    parser.add_argument('--no-cache', action='store_true', help="don't read or write event caches next to the combat.logs")
+    parser.add_argument('--profile', action='store_true', help="time each stage and count regex matches, saved as Profile.json in each output folder")
+    parser.add_argument('--merge', action='store_true', help="also generate one output of all the combat.logs merged, e.g. for a week of sessions")
+    parser.add_argument('--sqlite', metavar='DATABASE', help="also export every event to this SQLite database for SQL queries, logs already in it are skipped")
+    args = parser.parse_args(argv)
+
+    if len(args.paths) > 0:
+        combat_logs = expand_combat_log_paths(args.paths, root=launch_dir)
+        if len(combat_logs) == 0:
+            sys.exit('No files found matching %s' % (args.paths))
+        batch_main(combat_logs, workers=args.workers, custom_text_field=args.text, copy_log=args.copy_log, use_cache=not args.no_cache, profile=args.profile, merge=args.merge,
+            sqlite_database=None if args.sqlite is None else os.path.join(launch_dir, args.sqlite))
+        return None
 
     try:
-        i = 0
-        while True:
-            if lines[i][0] == "[" and lines[i][3] == "/":
-                i_start = i
-                break
-            else:
-                i += 1
-                continue
+        user_prompt_main()
+    except:
+        traceback.print_exception(sys.exception(), file=sys.stdout)
+        print("\nUnrecoverable error. Press enter to exit.")
+        input()
 
-        i = -1
-        while True:
-            if lines[i][0] == "[" and lines[i][3] == "/":
-                i_end = len(lines) - -i
-                break
-            else:
-                i = i - 1
-        
-        return i_start, i_end
-    except (IndexError):
-        raise IndexError("Could not find any lines that match format of a combat.log. Index num: %s" % (i))
 
 ############################## module end
 
-try:
-    user_prompt_main()
-except:
-    traceback.print_exception(sys.exception(), file=sys.stdout)
-    print("\nUnrecoverable error. Press enter to exit.")
-    input()
\ No newline at end of file
+if __name__ == '__main__':
+    multiprocessing.freeze_support() # parallel_log_builder()'s processes, when bundled as an .exe
+    launch_dir = os.getcwd() # command line paths are relative to it
+    # uncomment if using as a python file
+    os.chdir(sys.path[0])
+    # or
+    # uncomment if using as an .exe file through pyinstaller
+    #app_path = os.path.dirname(sys.executable)
+    main(launch_dir=launch_dir)